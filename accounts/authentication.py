@@ -0,0 +1,165 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Per-process LRU of token key -> (user, token) with a TTL.
+
+    Entries are dropped by the signals in accounts.signals when a token is
+    deleted or its user is saved or deleted, which covers logout, password
+    changes, user deletion and deactivation. The same signals stamp the
+    revocation time in the shared ``alias`` cache, which every process
+    checks on a hit, so other workers stop accepting the token too.
+    queryset.update() calls are picked up within the TTL.
+    """
+    key_prefix = 'token-auth:revoked'
+
+    def __init__(self, max_size, timeout, alias):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.alias = alias
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.lock = threading.Lock()
+        # Bumped by every invalidation; see set()
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @property
+    def revocations(self):
+        return caches[self.alias]
+
+    def token_revocation(self, key):
+        return f'{self.key_prefix}:token:{key}'
+
+    def user_revocation(self, user_id):
+        return f'{self.key_prefix}:user:{user_id}'
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            _, user, token, looked_up = entry
+
+        # Revoked by any process after the lookup
+        stamps = self.revocations.get_many([self.token_revocation(key), self.user_revocation(user.pk)])
+        with self.lock:
+            if any(stamp >= looked_up for stamp in stamps.values()):
+                if self.entries.get(key) is entry:
+                    self._remove(key)
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+        # Views change request.user in place; never hand out the shared copy
+        return copy.copy(user), token
+
+    def set(self, key, user, token, generation, looked_up=None):
+        """
+        Store a lookup started when ``generation`` was current, at wall
+        clock time ``looked_up`` (now by default). If anything was
+        invalidated since, the lookup may predate it and is not stored.
+        """
+        with self.lock:
+            if generation != self.generation or self.max_size <= 0:
+                return
+            looked_up = time.time() if looked_up is None else looked_up
+            self.entries[key] = (time.monotonic() + self.timeout, copy.copy(user), token, looked_up)
+            self.entries.move_to_end(key)
+            self.keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate_token(self, key):
+        with self.lock:
+            self.generation += 1
+            if key in self.entries:
+                self._remove(key)
+                self.invalidations += 1
+        self.publish(self.token_revocation(key))
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            self.generation += 1
+            for key in list(self.keys_by_user.get(user_id, ())):
+                self._remove(key)
+                self.invalidations += 1
+        self.publish(self.user_revocation(user_id))
+
+    def publish(self, revocation_key):
+        # Entries live at most ``timeout`` seconds, so older stamps can go
+        self.revocations.set(revocation_key, time.time(), self.timeout + 1)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.keys_by_user.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _remove(self, key):
+        _, user, _, _ = self.entries.pop(key)
+        keys = self.keys_by_user.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[user.pk]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'timeout': self.timeout,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TIMEOUT, settings.TOKEN_AUTH_REVOCATION_CACHE,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that skips the Token/user join for tokens it has
+    resolved recently. Only valid tokens of active users are cached.
+    """
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        generation, looked_up = token_cache.generation, time.time()
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        token_cache.set(key, token.user, token, generation, looked_up)
+        return (token.user, token)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """
+    scrypt with its cost taken from the PASSWORD_SCRYPT_* settings. Hashes
+    made with other parameters still verify and are upgraded on login.
+    """
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    # scrypt needs 128 * N * r bytes. This is only a ceiling, raised over
+    # OpenSSL's 32 MiB so hashes from a higher past cost still verify.
+    maxmem = 256 * 1024 * 1024
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with its cost taken from the PASSWORD_ARGON2_* settings.
+    Needs the optional argon2-cffi package.
+    """
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import verify_password
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from accounts.passwords import run_hashing
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = "Measure password checks per second per core for each configured hasher, inline and on the login pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3.0, help="Duration of each measurement")
+        parser.add_argument('--clients', type=int, default=16, help="Concurrent logins against the pool")
+
+    def handle(self, *args, **options):
+        cores = min(settings.PASSWORD_HASH_WORKERS, os.cpu_count() or 1)
+        self.stdout.write(f"{settings.PASSWORD_HASH_WORKERS} hashing workers, {os.cpu_count()} CPUs")
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as exc:
+                # e.g. Argon2 without argon2-cffi
+                self.stdout.write(f"{hasher.algorithm}: skipped ({exc})")
+                continue
+
+            inline = self.measure(lambda: verify_password(PASSWORD, encoded), 1, options['seconds'])
+            pooled = self.measure(lambda: run_hashing(verify_password, PASSWORD, encoded), options['clients'], options['seconds'])
+            cost = {key: value for key, value in hasher.safe_summary(encoded).items() if key not in ('algorithm', 'salt', 'hash')}
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{hasher.algorithm} {cost}: inline {inline:.1f}/s, "
+                f"pool {pooled:.1f}/s = {pooled / cores:.1f} logins/s per core"
+            ))
+
+    def measure(self, check, clients, seconds):
+        deadline = time.perf_counter() + seconds
+        counts = [0] * clients
+
+        def client(number):
+            while time.perf_counter() < deadline:
+                check()
+                counts[number] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts) / (time.perf_counter() - started)
+
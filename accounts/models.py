@@ -20,6 +20,13 @@ class CustomUser(AbstractUser):
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
-    
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # User listing filters (?role=, ?city=)
+            models.Index(fields=['role'], name='accounts_user_role_idx'),
+            models.Index(fields=['city'], name='accounts_user_city_idx'),
+        ]
+
     def __str__(self):
         return self.email
\ No newline at end of file
@@ -0,0 +1,116 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.views import exception_handler as drf_exception_handler
+
+
+class HashingUnavailable(Exception):
+    """
+    The password pool stayed full for PASSWORD_HASH_QUEUE_TIMEOUT. A plain
+    exception, since Django views (the admin login) authenticate through
+    the pool too: exception_handler answers it for DRF views and
+    HashingUnavailableMiddleware for the rest, both with a 503.
+    """
+    message = 'Too many logins in progress, try again shortly.'
+
+    def __init__(self, wait):
+        super().__init__(self.message)
+        self.wait = wait
+
+
+class ServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = HashingUnavailable.message
+    default_code = 'hashing_unavailable'
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF's exception handler turns this into Retry-After
+        self.wait = wait
+
+
+def exception_handler(exc, context):
+    if isinstance(exc, HashingUnavailable):
+        exc = ServiceUnavailable(exc.wait)
+    return drf_exception_handler(exc, context)
+
+
+class HashingUnavailableMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingUnavailable):
+            return None
+        response = HttpResponse(exception.message, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                content_type='text/plain')
+        response['Retry-After'] = str(exception.wait)
+        return response
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix='password-hashing',
+            )
+            _slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
+    return _executor, _slots
+
+
+def run_hashing(func, *args):
+    """
+    Run a hashing call on the bounded password pool and wait for it.
+
+    At most PASSWORD_HASH_WORKERS hashes run at once, so a burst of logins
+    cannot take every core from the other requests; the hashers release
+    the GIL while they work. PASSWORD_HASH_QUEUE more may wait, and beyond
+    that callers wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot
+    before getting a 503 with Retry-After.
+    """
+    executor, slots = get_executor()
+    timeout = settings.PASSWORD_HASH_QUEUE_TIMEOUT
+    if not slots.acquire(timeout=timeout):
+        raise HashingUnavailable(wait=max(1, round(timeout)))
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def check_password(user, raw_password):
+    """
+    user.check_password() with the hashing on the pool. A correct password
+    stored with an outdated hasher or cost is rehashed and saved.
+    """
+    valid, must_update = run_hashing(verify_password, raw_password, user.password)
+    if valid and must_update:
+        set_password(user, raw_password)
+        user.save(update_fields=['password'])
+    return valid
+
+
+def set_password(user, raw_password):
+    # user.set_password() with the hashing on the pool
+    user.password = run_hashing(make_password, raw_password)
+    user._password = raw_password
+
+
+def hash_dummy_password(raw_password):
+    # Same work as a real check, so unknown accounts can't be told by timing
+    run_hashing(make_password, raw_password)
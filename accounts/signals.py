@@ -1,10 +1,25 @@
 # accounts/signals.py
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from .authentication import token_cache
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
         Token.objects.get_or_create(user=instance)
+
+
+@receiver(post_delete, sender=Token)
+def forget_cached_token(sender, instance=None, **kwargs):
+    token_cache.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(sender, instance=None, **kwargs):
+    # Covers deactivation and password changes, and keeps request.user
+    # from serving stale profile fields
+    token_cache.invalidate_user(instance.pk)
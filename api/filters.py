@@ -0,0 +1,20 @@
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from accounts.models import CustomUser
+
+
+class UserFilterSerializer(serializers.Serializer):
+    role = serializers.ChoiceField(choices=CustomUser.ROLE_CHOICES, required=False)
+    city = serializers.CharField(max_length=100, required=False)
+
+
+class UserFilterBackend(BaseFilterBackend):
+    """
+    ``?role=`` and ``?city=``, both exact matches so they can use the
+    indexes on those columns. Invalid values answer 400.
+    """
+    def filter_queryset(self, request, queryset, view):
+        params = UserFilterSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return queryset.filter(**params.validated_data)
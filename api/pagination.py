@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, _positive_int
+
+
+class UserCursorPagination(CursorPagination):
+    # Keyset pagination on the primary key: deep pages cost the same as
+    # the first one
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=settings.USER_MAX_PAGE_SIZE,
+            )
+        except (KeyError, ValueError):
+            return settings.USER_PAGE_SIZE
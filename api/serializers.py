@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from accounts.models import CustomUser
 from django.contrib.auth import authenticate
+from accounts.passwords import check_password
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -39,6 +40,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 # retrieve the users information
 class CustomUserSerializer(serializers.ModelSerializer):
+    fields_query_param = 'fields'
+
     class Meta:
         model = CustomUser
         fields = [
@@ -47,6 +50,29 @@ class CustomUserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    def __init__(self, *args, fields=None, **kwargs):
+        # fields: a sparse fieldset, as returned by requested_fields()
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        The fields listed in ``?fields=id,username,role``, or None for all.
+        """
+        param = request.query_params.get(cls.fields_query_param)
+        if not param:
+            return None
+        fields = [name for name in dict.fromkeys(param.split(',')) if name]
+        unknown = [name for name in fields if name not in cls.Meta.fields]
+        if unknown or not fields:
+            raise serializers.ValidationError({
+                cls.fields_query_param: [f"Unknown fields: {', '.join(unknown)}." if unknown else "No fields given."],
+            })
+        return fields
+
 class ProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
@@ -92,7 +118,7 @@ class ChangePasswordSerializer(serializers.Serializer):
 
     def validate(self, data):
         user = self.context['request'].user
-        if not user.check_password(data['old_password']):
+        if not check_password(user, data['old_password']):
             raise serializers.ValidationError({"old_password": "Old password is incorrect"})
         if data['new_password'] != data['new_password_confirm']:
             raise serializers.ValidationError({"new_password": "New passwords must match"})
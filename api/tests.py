@@ -1,3 +1,243 @@
-from django.test import TestCase
+import contextlib
+import importlib.util
+import os
+import subprocess
+import sys
+import unittest
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.authentication import TokenCache, token_cache
+from accounts.models import CustomUser
+from accounts.passwords import get_executor
+from core.throttling import get_store
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        get_store().clear()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = CustomUser.objects.create_user(
+            username='broker', email='broker@example.com', password='secret-pass'
+        )
+        self.token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def profile(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/accounts/profile/')
+        return response, [query['sql'] for query in ctx.captured_queries]
+
+    def test_second_request_skips_token_lookup(self):
+        response, queries = self.profile()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.profile()
+        self.assertEqual(response.data['email'], 'broker@example.com')
+        self.assertEqual(queries, [])
+        self.assertEqual(token_cache.stats()['hits'], 1)
+        self.assertEqual(token_cache.stats()['hit_rate'], 0.5)
+
+    def test_logout_revokes_cached_token(self):
+        self.profile()
+        self.assertEqual(self.client.post('/api/accounts/logout/').status_code, 200)
+        self.assertEqual(self.profile()[0].status_code, 401)
+
+    def test_password_change_revokes_cached_token(self):
+        self.profile()
+        response = self.client.post('/api/accounts/password/change/', {
+            'old_password': 'secret-pass', 'new_password': 'another-pass', 'new_password_confirm': 'another-pass',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile()[0].status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['new_token']}")
+        self.assertEqual(self.profile()[0].status_code, 200)
+
+    def test_deactivation_and_deletion_revoke_cached_users(self):
+        self.profile()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.profile()[0].status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.profile()
+        admin = CustomUser.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.delete(f'/api/accounts/delete-user/{self.user.pk}/').status_code, 204)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.profile()[0].status_code, 401)
+
+    def test_profile_updates_are_not_served_stale(self):
+        self.profile()
+        self.client.patch('/api/accounts/profile/update/', {'bio': 'Selling villas'})
+        self.assertEqual(self.profile()[0].data['bio'], 'Selling villas')
+
+    def test_revocations_reach_other_processes(self):
+        # Another worker: its own LRU, the same shared revocation cache
+        other = TokenCache(10, 60, settings.TOKEN_AUTH_REVOCATION_CACHE)
+        other.set(self.token.key, self.user, self.token, other.generation)
+        self.assertIsNotNone(other.get(self.token.key))
+
+        self.assertEqual(self.client.post('/api/accounts/logout/').status_code, 200)
+        self.assertIsNone(other.get(self.token.key))
+        self.assertEqual(other.stats()['size'], 0)
+
+        token = Token.objects.create(user=self.user)
+        other.set(token.key, self.user, token, other.generation)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(other.get(token.key))
+
+        # Lookups made after the revocation are cached again
+        other.set(token.key, self.user, token, other.generation)
+        self.assertIsNotNone(other.get(token.key))
+
+    def test_lru_and_ttl_bounds(self):
+        users = [
+            CustomUser.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        old_size, old_timeout = token_cache.max_size, token_cache.timeout
+        self.addCleanup(setattr, token_cache, 'max_size', old_size)
+        self.addCleanup(setattr, token_cache, 'timeout', old_timeout)
+        token_cache.max_size = 2
+        for user in users:
+            token_cache.set(user.auth_token.key, user, user.auth_token, token_cache.generation)
+        self.assertEqual(token_cache.stats()['size'], 2)
+        self.assertEqual(token_cache.stats()['evictions'], 1)
+        self.assertIsNone(token_cache.get(users[0].auth_token.key))
+
+        token_cache.timeout = -1
+        token_cache.set(users[0].auth_token.key, users[0], users[0].auth_token, token_cache.generation)
+        self.assertIsNone(token_cache.get(users[0].auth_token.key))
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/accounts/auth-cache/stats/').status_code, 403)
+        admin = CustomUser.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/accounts/auth-cache/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_rate', response.data)
+
+
+class PooledLoginTests(APITestCase):
+    def setUp(self):
+        get_store().clear()
+        self.user = CustomUser.objects.create_user(
+            username='broker', email='broker@example.com', password='secret-pass'
+        )
+
+    def login(self, password='secret-pass', email='broker@example.com'):
+        return self.client.post('/api/accounts/login/', {'email': email, 'password': password})
+
+    def test_login_and_failures(self):
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], self.user.auth_token.key)
+        self.assertEqual(self.login('wrong-pass').status_code, 400)
+        self.assertEqual(self.login(email='nobody@example.com').status_code, 400)
+
+    def test_legacy_hashes_are_upgraded_on_login(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            password=make_password('secret-pass', hasher='pbkdf2_sha256')
+        )
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$16384$'))
+
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 12):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$4096$'))
+
+    @unittest.skipIf(importlib.util.find_spec('argon2'), 'argon2-cffi is installed')
+    def test_argon2_without_package_fails_at_startup(self):
+        env = {**os.environ, 'PASSWORD_HASHER': 'argon2'}
+        result = subprocess.run([sys.executable, '-c', 'import django; django.setup()'], env=env,
+                                cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('PASSWORD_HASHER=argon2 requires the argon2-cffi package', result.stderr)
+
+    @contextlib.contextmanager
+    def saturated_pool(self):
+        _, slots = get_executor()
+        capacity = settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE
+        for _ in range(capacity):
+            slots.acquire()
+        try:
+            with override_settings(PASSWORD_HASH_QUEUE_TIMEOUT=0.01):
+                yield
+        finally:
+            for _ in range(capacity):
+                slots.release()
+
+    def test_saturated_pool_answers_503(self):
+        with self.saturated_pool():
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response.data['detail'].code, 'hashing_unavailable')
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_saturated_pool_answers_503_to_admin_login(self):
+        # The admin authenticates through the model backend, outside DRF
+        with self.saturated_pool():
+            response = self.client.post('/admin/login/', {'username': 'broker@example.com', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'login': '2/min'},
+    })
+    def test_login_attempts_are_throttled_per_client(self):
+        self.assertEqual(self.login('wrong-pass').status_code, 400)
+        self.assertEqual(self.login('wrong-pass').status_code, 400)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        response = self.client.post('/api/accounts/login/', {'email': 'broker@example.com', 'password': 'secret-pass'},
+                                    REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+
+class UserListTests(APITestCase):
+    def setUp(self):
+        get_store().clear()
+        for i, (role, city) in enumerate([('BROKER', 'Addis Ababa'), ('CUSTOMER', 'Addis Ababa'),
+                                          ('BROKER', 'Adama'), ('BROKER', 'Addis Ababa')]):
+            CustomUser.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com', password='x', role=role, city=city, bio='Long bio',
+            )
+
+    def test_pagination_and_filters(self):
+        response = self.client.get('/api/accounts/users/?page_size=2')
+        self.assertEqual([user['username'] for user in response.data['results']], ['user0', 'user1'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([user['username'] for user in response.data['results']], ['user2', 'user3'])
+
+        response = self.client.get('/api/accounts/users/', {'role': 'BROKER', 'city': 'Addis Ababa'})
+        self.assertEqual([user['username'] for user in response.data['results']], ['user0', 'user3'])
+        self.assertEqual(self.client.get('/api/accounts/users/?role=OWNER').status_code, 400)
+
+    def test_sparse_fields_load_only_those_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/accounts/users/?fields=id,username,role')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'username', 'role'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('"bio"', ctx.captured_queries[0]['sql'])
+
+        response = self.client.get('/api/accounts/users/?fields=username,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
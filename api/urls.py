@@ -1,7 +1,7 @@
 # accounts/urls.py
 from django.urls import path
 from .views import ( RegisterAPI, ProfileAPI, LoginAPI, LogoutAPI, UserListAPI, UserRetrieveAPI
-            , ProfileUpdateAPI, ChangePasswordAPI, DeleteUserAPI)
+            , ProfileUpdateAPI, ChangePasswordAPI, DeleteUserAPI, AuthCacheStatsAPI, DatabaseStatsAPI)
 
 app_name = 'accounts'
 
@@ -15,4 +15,6 @@ urlpatterns = [
     path('profile/update/', ProfileUpdateAPI.as_view(), name='profile_update'),
     path('password/change/', ChangePasswordAPI.as_view(), name='change_password'),
     path('delete-user/<int:user_id>/', DeleteUserAPI.as_view(), name='delete_user'),
+    path('auth-cache/stats/', AuthCacheStatsAPI.as_view(), name='auth_cache_stats'),
+    path('database/stats/', DatabaseStatsAPI.as_view(), name='database_stats'),
 ]
@@ -10,11 +10,18 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.authtoken.models import Token
 from .serializers import (UserRegistrationSerializer, UserProfileSerializer, CustomUserSerializer
                     , LoginSerializer, ProfileUpdateSerializer, ChangePasswordSerializer)
+from accounts.authentication import token_cache
+from accounts.passwords import set_password
 from accounts.models import CustomUser
+from core.routers import routing_stats
+from .filters import UserFilterBackend
+from .pagination import UserCursorPagination
 
 
 class LoginAPI(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'login'
+
     def post(self, request, *args, **kwargs):
         serializer = LoginSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
@@ -38,6 +45,7 @@ class RegisterAPI(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
     parser_classes = (MultiPartParser, FormParser, JSONParser)
+    throttle_scope = 'register'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -60,6 +68,22 @@ class UserListAPI(generics.ListAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [AllowAny]
+    pagination_class = UserCursorPagination
+    filter_backends = [UserFilterBackend]
+    sparse_fields = None
+
+    def get_queryset(self):
+        # Every serializer field is a column of the same name: load only
+        # the ones shown, plus the primary key the pagination orders by
+        fields = self.sparse_fields or CustomUserSerializer.Meta.fields
+        return super().get_queryset().only('id', *fields)
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, fields=self.sparse_fields, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        self.sparse_fields = CustomUserSerializer.requested_fields(request)
+        return super().list(request, *args, **kwargs)
 
 class UserRetrieveAPI(generics.RetrieveAPIView):
     queryset = CustomUser.objects.all()
@@ -90,7 +114,7 @@ class ChangePasswordAPI(APIView):
         serializer.is_valid(raise_exception=True)
         
         user = request.user
-        user.set_password(serializer.validated_data['new_password'])
+        set_password(user, serializer.validated_data['new_password'])
         user.save()
         
         # Optional: Revoke existing token and create new one
@@ -132,3 +156,19 @@ class DeleteUserAPI(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+
+class AuthCacheStatsAPI(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # Counters of the worker process that answers
+        return Response(token_cache.stats())
+
+
+class DatabaseStatsAPI(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # Read routing decisions of the worker process that answers, and
+        # the current lag of each replica in seconds
+        return Response(routing_stats.snapshot())
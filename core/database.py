@@ -0,0 +1,74 @@
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+_write_locks = {}
+_write_locks_lock = threading.Lock()
+
+
+def sqlite_database(name, profile, timeout, persistent=True):
+    """
+    A DATABASES entry for the SQLite file ``name``, set up as described by
+    a profile from settings.SQLITE_PROFILES, waiting up to ``timeout``
+    seconds on a locked database. ``persistent=False`` closes connections
+    after each request whatever the profile says.
+    """
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {pragma} = {value}' for pragma, value in profile['pragmas'].items()),
+            'transaction_mode': profile['transaction_mode'],
+            'timeout': timeout,
+        },
+        'CONN_MAX_AGE': profile['conn_max_age'] if persistent else 0,
+        # Persistent connections are checked before reuse
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+
+def get_write_lock(using=DEFAULT_DB_ALIAS):
+    with _write_locks_lock:
+        return _write_locks.setdefault(using, threading.Lock())
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and 'locked' in str(exc)
+
+
+def serialized_write(func=None, *, using=DEFAULT_DB_ALIAS):
+    """
+    Run ``func`` in a transaction, one at a time per process, retrying with
+    exponential backoff while SQLite reports the database as locked.
+
+    SQLite allows a single writer. Queueing this process's writers on a
+    lock hands the database over as soon as the previous one commits,
+    instead of every thread polling the busy handler; the retries only
+    cover contention with other processes that outlasts the busy timeout.
+
+    Inside an outer transaction the work done before ``func`` can't be
+    retried, and other databases lock rows themselves, so there ``func``
+    just runs.
+    """
+    if func is None:
+        return lambda func: serialized_write(func, using=using)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        connection = connections[using]
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return func(*args, **kwargs)
+
+        for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+            try:
+                with get_write_lock(using), transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not is_lock_error(exc) or attempt == settings.SQLITE_WRITE_RETRIES:
+                    raise
+            time.sleep(settings.SQLITE_WRITE_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
@@ -0,0 +1,153 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Names written by main.storage.ContentAddressedStorage never change content
+CONTENT_ADDRESSED = re.compile(r'(?:^|/)(?P<digest>[0-9a-f]{64})\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class RangeFile:
+    """
+    Read-only view of ``length`` bytes of ``file`` from its current offset.
+
+    It has no fileno(): a WSGI server's file_wrapper would sendfile() from
+    the descriptor, and not every server stops at Content-Length (uWSGI
+    sends to the end of the file). Ranges are streamed by the worker.
+    """
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def get_etag(name, stats):
+    match = CONTENT_ADDRESSED.search(name)
+    if match:
+        return f'"{match["digest"]}"'
+    return f'"{stats.st_size:x}-{stats.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single-range ``Range`` header,
+    None to serve the whole file, or False when it is unsatisfiable.
+    Multi-range requests get the whole file, which RFC 9110 allows.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or size == 0:
+        return False
+    return start, end
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file under MEDIA_ROOT according to MEDIA_SERVE_MODE.
+
+    ``x-sendfile`` and ``x-accel-redirect`` answer with headers only and let
+    the front server (Apache/lighttpd or nginx) send the bytes. ``django``
+    answers from the worker with a FileResponse, which WSGI servers such as
+    gunicorn pass to sendfile(); byte ranges are supported there too, but
+    streamed through read().
+    Either way conditional requests are answered here from a stat() call.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stats = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404
+
+    etag = get_etag(path, stats)
+    immutable = bool(CONTENT_ADDRESSED.search(path))
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stats.st_mtime),
+        'Cache-Control': (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable
+            else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+        ),
+    }
+
+    # HTTP dates have whole-second precision
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stats.st_mtime))
+    if not_modified is not None:
+        if isinstance(not_modified, HttpResponseNotModified):
+            for header, value in headers.items():
+                not_modified[header] = value
+        return not_modified
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+    if mode in ('x-sendfile', 'x-accel-redirect'):
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if mode == 'x-sendfile':
+            response['X-Sendfile'] = full_path
+        else:
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        return response
+
+    headers['Accept-Ranges'] = 'bytes'
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if 'Range' in request.headers and (if_range is None or if_range == etag):
+        byte_range = parse_range(request.headers['Range'], stats.st_size)
+    if byte_range is False:
+        headers['Content-Range'] = f'bytes */{stats.st_size}'
+        return HttpResponse(status=416, headers=headers)
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        return FileResponse(file, content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    file.seek(start)
+    response = FileResponse(RangeFile(file, end - start + 1), status=206, content_type=content_type, headers=headers)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{stats.st_size}'
+    return response
+
+
+def media_urlpatterns():
+    # With MEDIA_SERVE_MODE 'off' the front server owns MEDIA_URL entirely
+    if settings.MEDIA_SERVE_MODE == 'off':
+        return []
+    prefix = settings.MEDIA_URL.lstrip('/')
+    return [re_path(rf'^{re.escape(prefix)}(?P<path>.*)$', serve_media, name='media')]
@@ -0,0 +1,57 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Numbers the two encoders spell differently: below 1e-4 Python writes
+# 1e-05 where orjson writes 0.00001 or 1e-5, and from 1e16 on 1e+16
+# where orjson writes 1e16. The pattern also matches inside strings,
+# which only costs a stdlib render. It is slow to scan for, so output
+# is first checked for its literal parts.
+AMBIGUOUS_NUMBER = re.compile(rb'[:,\[]-?(?:0\.0000|\d+(?:\.\d+)?e)')
+EXPONENT = re.compile(rb'e[-\d]')
+
+
+def has_ambiguous_number(ret):
+    if b'0.0000' not in ret and not EXPONENT.search(ret):
+        return False
+    return AMBIGUOUS_NUMBER.search(ret) is not None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes, through orjson when installed.
+
+    Renders with the stdlib (as JSONRenderer does) when orjson is missing,
+    for indented output, for values orjson can't encode (such as integers
+    beyond 64 bits) and when the output holds a number the two libraries
+    format differently. Dates, decimals and anything else orjson doesn't
+    handle natively go through the same encoder class. (One difference
+    remains: NaN and infinity, which JSONRenderer refuses, become null.)
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except (orjson.JSONEncodeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+        if has_ambiguous_number(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # As JSONRenderer: keep the output a strict JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
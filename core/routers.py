@@ -0,0 +1,232 @@
+import contextvars
+import logging
+import math
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+# Authentication must see tokens and sessions the moment they are issued
+# or revoked, so these are never read from a replica
+PRIMARY_ONLY_MODELS = {'authtoken.token', 'sessions.session'}
+
+# Seconds a measured replica lag is reused before measuring again
+LAG_CHECK_INTERVAL = 1
+
+_routing = contextvars.ContextVar('replica_routing', default=None)
+
+
+class RoutingStats:
+    """
+    Where reads went, for the database stats endpoint: 'replica', 'primary'
+    (writes' requests, transactions, authentication, no request), 'sticky'
+    (the user wrote recently) and 'stale' (no replica was fresh enough).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def record(self, decision):
+        with self.lock:
+            self.decisions[decision] = self.decisions.get(decision, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.decisions = {}
+
+    def snapshot(self):
+        with self.lock:
+            decisions = dict(self.decisions)
+        replicas = {}
+        for alias in settings.DATABASE_REPLICAS:
+            lag = replica_lag(alias)
+            replicas[alias] = {
+                # None: unknown, or not snapshotted yet
+                'lag': None if lag is None or math.isinf(lag) else round(lag, 3),
+                'stale': is_stale(lag),
+            }
+        return {'decisions': decisions, 'replicas': replicas}
+
+
+routing_stats = RoutingStats()
+_lags = {}
+
+
+def replica_lag(alias):
+    """
+    Seconds since the replica's data was copied from the primary; None if
+    unknown (not a snapshot replica) and inf if it can't be read.
+
+    Snapshot replicas carry the time of their snapshot in SQLite's
+    user_version header field (see snapshot_replica()).
+    """
+    checked, lag = _lags.get(alias, (None, None))
+    now = time.time()
+    if checked is not None and now - checked < LAG_CHECK_INTERVAL:
+        return lag
+
+    connection = connections[alias]
+    lag = None
+    if connection.vendor == 'sqlite':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA user_version')
+                snapshot_time = cursor.fetchone()[0]
+        except DatabaseError:
+            snapshot_time = 0
+        # 0: never snapshotted, or in the middle of a snapshot
+        lag = now - snapshot_time if snapshot_time else float('inf')
+    _lags[alias] = (now, lag)
+    return lag
+
+
+def is_stale(lag):
+    max_lag = settings.REPLICA_MAX_LAG
+    return max_lag is not None and lag is not None and lag > max_lag
+
+
+def in_transaction(using=DEFAULT_DB_ALIAS):
+    # Ignoring the transaction a TestCase wraps around each test, as
+    # Django's own durable=True check does
+    return any(not getattr(atomic, '_from_testcase', False) for atomic in connections[using].atomic_blocks)
+
+
+def pin_key(user_pk):
+    return f'replica:pinned:{user_pk}'
+
+
+class RequestRouting:
+    def __init__(self, request):
+        self.request = request
+        self.read_only = request.method in ('GET', 'HEAD', 'OPTIONS')
+        self.replica_reads = 0
+        self._pinned = None
+
+    def user(self):
+        # Only once authentication has run: DRF replaces the middleware's
+        # lazy user, and resolving that one here would query the database
+        # from inside the router
+        user = self.request.__dict__.get('user')
+        if user is None or isinstance(user, SimpleLazyObject):
+            return None
+        return user
+
+    def pinned(self):
+        if self._pinned is None:
+            user = self.user()
+            if user is None:
+                return False
+            self._pinned = user.is_authenticated and cache.get(pin_key(user.pk)) is not None
+        return self._pinned
+
+
+def replica_reads():
+    """
+    How many reads of the current request went to a replica so far (0
+    outside requests).
+    """
+    routing = _routing.get()
+    return 0 if routing is None else routing.replica_reads
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary; reads made while serving a safe request go
+    to a random replica from DATABASE_REPLICAS that is at most
+    REPLICA_MAX_LAG seconds behind.
+
+    Reads stay on the primary outside requests (management commands),
+    until the request's user is authenticated, inside transactions, for
+    PRIMARY_ONLY_MODELS and for
+    REPLICA_STICKY_SECONDS after the user's own successful write, so users
+    always read what they just wrote.
+    """
+    def db_for_read(self, model, **hints):
+        alias, decision = self.route_read(model)
+        routing_stats.record(decision)
+        logger.debug("Read of %s routed to %s (%s)", model._meta.label_lower, alias, decision)
+        return alias
+
+    def route_read(self, model):
+        routing = _routing.get()
+        if (
+            not settings.DATABASE_REPLICAS
+            or routing is None
+            or not routing.read_only
+            or model._meta.label_lower in PRIMARY_ONLY_MODELS
+            or in_transaction()
+            # Authentication itself (e.g. the session's user lookup) must
+            # see deactivations and password changes at once
+            or routing.user() is None
+        ):
+            return DEFAULT_DB_ALIAS, 'primary'
+        if routing.pinned():
+            return DEFAULT_DB_ALIAS, 'sticky'
+
+        fresh = [alias for alias in settings.DATABASE_REPLICAS if not is_stale(replica_lag(alias))]
+        if not fresh:
+            return DEFAULT_DB_ALIAS, 'stale'
+        routing.replica_reads += 1
+        return random.choice(fresh), 'replica'
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let the router see the current request, and pin the user to the
+    primary after a successful write.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = RequestRouting(request)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if not routing.read_only and response.status_code < 400 and settings.DATABASE_REPLICAS:
+            user = routing.user()
+            if user is not None and user.is_authenticated:
+                cache.set(pin_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+def snapshot_replica(alias='replica', source=DEFAULT_DB_ALIAS):
+    """
+    Copy the ``source`` SQLite database into the ``alias`` one with the
+    online backup API, so readers of the replica keep working, then stamp
+    it with the time the copy started. Returns that time.
+    """
+    started = int(time.time())
+    primary = connections[source]
+    primary.ensure_connection()
+    replica = sqlite3.connect(connections[alias].settings_dict['NAME'], timeout=settings.SQLITE_BUSY_TIMEOUT)
+    try:
+        primary.connection.backup(replica)
+        # The copy brought the primary's user_version (0) along; readers
+        # that look in between see an unknown lag and use the primary
+        replica.execute(f'PRAGMA user_version = {started}')
+    finally:
+        replica.close()
+    _lags.pop(alias, None)
+    return started
@@ -10,8 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
+from core.database import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -55,8 +61,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.passwords.HashingUnavailableMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -85,40 +93,206 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 
-    # Login trial rate limiting
+    # Token bucket rate limiting (core.throttling): 'N/period' allows
+    # bursts of N and refills N per period. Views pick a scope with
+    # throttle_scope.
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
+        'core.throttling.AnonTokenBucketThrottle',
+        'core.throttling.ScopedTokenBucketThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
+        'login': '10/min',
+        'register': '5/hour',
+        'property_list': '120/min',
+        'property_upload': '30/hour',
     },
 
+    # Same bytes as DRF's JSONRenderer, through orjson when installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
     # 👇 This comma was missing above
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
-    ]
+    ],
+
+    # 503 with Retry-After when the password pool is saturated
+    'EXCEPTION_HANDLER': 'accounts.passwords.exception_handler',
 }
 
+# Property catalogue pagination: default page size and the upper bound
+# clients can request through ?page_size=
+PROPERTY_PAGE_SIZE = 25
+PROPERTY_MAX_PAGE_SIZE = 100
+
+# Serialize property list pages from .values() rows (main.representation)
+# instead of model instances; the output is the same
+PROPERTY_ROW_SERIALIZATION = True
+
+# User listing pagination (api.pagination.UserCursorPagination)
+USER_PAGE_SIZE = 50
+USER_MAX_PAGE_SIZE = 200
+
+# Rows fetched per database round trip when streaming exports
+PROPERTY_EXPORT_CHUNK_SIZE = 2000
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite connection profiles, picked with the SQLITE_PROFILE environment
+# variable:
+#
+# "wal" (default) journals to a write-ahead log so readers never wait for
+# the single writer, syncs only at checkpoints (a power cut can lose the
+# last commits but never corrupts the file), maps the file into memory,
+# begins transactions IMMEDIATE so lock waits happen at BEGIN where the
+# busy timeout can absorb them, and keeps connections open between
+# requests (except under ASGI, see SQLITE_PERSISTENT_CONNECTIONS).
+#
+# "basic" is Django's stock rollback journal with a connection per
+# request, kept for comparison (benchmark_sqlite_concurrency).
+SQLITE_PROFILES = {
+    'basic': {
+        'pragmas': {'journal_mode': 'delete'},
+        'transaction_mode': 'DEFERRED',
+        'conn_max_age': 0,
+    },
+    'wal': {
+        'pragmas': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'mmap_size': 256 * 1024 * 1024,
+            # Negative: KiB rather than pages
+            'cache_size': -64 * 1024,
+            'temp_store': 'memory',
+        },
+        'transaction_mode': 'IMMEDIATE',
+        'conn_max_age': 600,
+    },
+}
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'wal')
+# Seconds a connection waits on a locked database before "database is locked"
+SQLITE_BUSY_TIMEOUT = 5
+# Django requires persistent connections to be disabled under ASGI, where
+# sync code runs on executor threads that would each leak one. core.asgi
+# sets DJANGO_SERVER_INTERFACE=asgi, which turns the profile's
+# conn_max_age off.
+SQLITE_PERSISTENT_CONNECTIONS = os.environ.get('DJANGO_SERVER_INTERFACE', 'wsgi') != 'asgi'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **sqlite_database(
+            BASE_DIR / 'db.sqlite3',
+            SQLITE_PROFILES[SQLITE_PROFILE],
+            SQLITE_BUSY_TIMEOUT,
+            SQLITE_PERSISTENT_CONNECTIONS,
+        ),
+        # A file-backed test database so concurrency tests see real SQLite
+        # locking instead of shared-cache "table is locked" errors.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Read replicas (core.routers.PrimaryReplicaRouter). Reads of safe
+# requests go to the aliases in DATABASE_REPLICAS (comma separated
+# environment variable, none by default); writes, transactions and
+# authentication always use the primary.
+#
+# "replica" is a local stand-in: a copy of the primary refreshed by
+# ``manage.py snapshot_replica --interval N``. Enable it with
+# DATABASE_REPLICAS=replica.
+DATABASES['replica'] = {
+    **sqlite_database(
+        os.environ.get('SQLITE_REPLICA_PATH', BASE_DIR / 'db.replica.sqlite3'),
+        SQLITE_PROFILES[SQLITE_PROFILE],
+        SQLITE_BUSY_TIMEOUT,
+        SQLITE_PERSISTENT_CONNECTIONS,
+    ),
+    'TEST': {
+        'MIRROR': 'default',
+    },
+}
+DATABASE_REPLICAS = [alias for alias in os.environ.get('DATABASE_REPLICAS', '').split(',') if alias]
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# Replicas further behind than this many seconds are skipped (None: no limit)
+REPLICA_MAX_LAG = 60
+# After a successful write, that user's reads stay on the primary this
+# long. The pins live in the default cache, which must be shared between
+# workers for this to hold across processes.
+REPLICA_STICKY_SECONDS = 15
+
+# In-process write serialization (core.database.serialized_write): how
+# often a write that still hit a locked database is retried, and the
+# first backoff in seconds (doubled per attempt, with jitter)
+SQLITE_WRITE_RETRIES = 3
+SQLITE_WRITE_BACKOFF = 0.05
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The property API keeps rendered list/detail data in its own cache.
+# Local memory by default (and in tests); point PROPERTY_CACHE_URL at
+# "file:///var/tmp/property_cache" or "redis://host:6379/1" in production
+# so every worker shares the cache and its invalidations.
+
+def cache_from_url(url, name):
+    if url.startswith(('redis://', 'rediss://')):
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+        }
+    if url.startswith('file://'):
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': url[len('file://'):],
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': name,
+    }
+
+
+PROPERTY_CACHE_URL = os.environ.get('PROPERTY_CACHE_URL', '')
+PROPERTY_CACHE_TIMEOUT = 300
+
+# Token buckets of the API throttles (core.throttling). Set
+# THROTTLE_CACHE_URL to a redis:// URL so every worker enforces the same
+# limits; the local memory default only limits each process.
+THROTTLE_CACHE_URL = os.environ.get('THROTTLE_CACHE_URL', '')
+THROTTLE_STORE = 'core.throttling.CacheTokenBucketStore'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'property_responses': cache_from_url(PROPERTY_CACHE_URL, 'property-responses'),
+    'throttle': cache_from_url(THROTTLE_CACHE_URL, 'throttle'),
+}
+
+# Per-process token -> user cache used by CachedTokenAuthentication.
+# Revocations are published in TOKEN_AUTH_REVOCATION_CACHE, which must be
+# shared by every worker (THROTTLE_CACHE_URL) for them to see logouts and
+# password changes before the timeout.
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TIMEOUT = 60
+TOKEN_AUTH_REVOCATION_CACHE = 'throttle'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +312,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+AUTHENTICATION_BACKENDS = ['accounts.backends.PooledModelBackend']
+
+# New passwords use the first hasher; the rest still verify older hashes,
+# which are upgraded on the next successful login. Argon2 needs the
+# optional argon2-cffi package: PASSWORD_HASHER=argon2.
+PASSWORD_HASHERS = [
+    'accounts.hashers.ScryptPasswordHasher',
+    'accounts.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+if os.environ.get('PASSWORD_HASHER') == 'argon2':
+    if importlib.util.find_spec('argon2') is None:
+        raise ImproperlyConfigured('PASSWORD_HASHER=argon2 requires the argon2-cffi package.')
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
+PASSWORD_SCRYPT_WORK_FACTOR = 2 ** 14
+PASSWORD_SCRYPT_BLOCK_SIZE = 8
+PASSWORD_SCRYPT_PARALLELISM = 1
+PASSWORD_ARGON2_TIME_COST = 2
+PASSWORD_ARGON2_MEMORY_COST = 102400
+PASSWORD_ARGON2_PARALLELISM = 8
+
+# Logins hash on a pool of PASSWORD_HASH_WORKERS threads; PASSWORD_HASH_QUEUE
+# more wait, and further logins get a 503 after PASSWORD_HASH_QUEUE_TIMEOUT s.
+PASSWORD_HASH_WORKERS = os.cpu_count() or 1
+PASSWORD_HASH_QUEUE = 32
+PASSWORD_HASH_QUEUE_TIMEOUT = 5
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -158,8 +361,44 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How MEDIA_URL is served (core.media): 'django' streams from the worker
+# via FileResponse/sendfile, 'x-sendfile' (Apache, lighttpd) and
+# 'x-accel-redirect' (nginx) hand the file to the front server, and 'off'
+# leaves MEDIA_URL to the front server entirely.
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+# nginx 'internal' location aliased to MEDIA_ROOT
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Content-addressed images are cached for a year; anything else this long
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
 STATIC_URL = 'static/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    # Property photos and their variants are stored once per distinct content
+    'property_images': {
+        'BACKEND': 'main.storage.ContentAddressedStorage',
+    },
+}
+
+# Limits for multipart uploads of property photos (main.uploads). Photos are
+# streamed to temporary files and validated from their headers only.
+PROPERTY_UPLOAD_MAX_BYTES = 64 * 1024 * 1024
+PROPERTY_UPLOAD_MAX_FILE_BYTES = 15 * 1024 * 1024
+PROPERTY_UPLOAD_MAX_FILES = 20
+PROPERTY_IMAGE_MAX_PIXELS = 50_000_000
+PROPERTY_IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+# Property image variants are generated off the request thread by a pool of
+# PROPERTY_IMAGE_WORKERS threads; 'sync' processes them inline on commit.
+PROPERTY_IMAGE_PROCESSING = 'thread'
+PROPERTY_IMAGE_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
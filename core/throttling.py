@@ -0,0 +1,180 @@
+import abc
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class LocalTokenBucketStore:
+    """
+    Token buckets in a dict of this process. Exact, but not shared between
+    workers; meant for tests and single-process deployments.
+    """
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, now):
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens, wait = take_token(tokens, updated, capacity, refill_rate, now)
+            self.buckets[key] = (tokens, now)
+        return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheTokenBucketStore:
+    """
+    Token buckets in the 'throttle' cache, shared by every worker that uses
+    the same cache. Each bucket is one (tokens, updated) pair.
+
+    On Redis a bucket is updated by a Lua script, atomically across
+    workers. Other backends read and write under a per-process lock, so
+    concurrent workers may occasionally both take the last token.
+    """
+    alias = 'throttle'
+
+    # KEYS[1]: bucket; ARGV: capacity, refill per second, now, ttl
+    REDIS_SCRIPT = """
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            wait = (1 - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+        redis.call('EXPIRE', KEYS[1], ARGV[4])
+        return tostring(wait)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def consume(self, key, capacity, refill_rate, now):
+        # A bucket refills completely in capacity / refill_rate seconds;
+        # after that its state is the default and can expire
+        ttl = int(capacity / refill_rate) + 1
+        cache = self.cache
+        if isinstance(cache, RedisCache):
+            client = cache._cache.get_client(key, write=True)
+            wait = client.eval(self.REDIS_SCRIPT, 1, cache.make_and_validate_key(key), capacity, refill_rate, now, ttl)
+            return float(wait)
+
+        with self.lock:
+            tokens, updated = cache.get(key, (capacity, now))
+            tokens, wait = take_token(tokens, updated, capacity, refill_rate, now)
+            cache.set(key, (tokens, now), ttl)
+        return wait
+
+    def clear(self):
+        self.cache.clear()
+
+
+def take_token(tokens, updated, capacity, refill_rate, now):
+    """
+    Refill a bucket for the time since ``updated`` and take one token.
+    Returns the new token count and 0, or the seconds until a token is
+    available when the bucket is empty.
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / refill_rate
+
+
+_stores = {}
+
+
+def get_store():
+    path = settings.THROTTLE_STORE
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+class TokenBucketThrottle(BaseThrottle, abc.ABC):
+    """
+    Token bucket version of DRF's SimpleRateThrottle.
+
+    A rate of ``N/period`` from DEFAULT_THROTTLE_RATES is a bucket holding
+    N tokens that refills at N per period: clients may burst up to N
+    requests and then continue at the average rate. Throttled responses
+    carry Retry-After with the time until the next token.
+    """
+    scope = None
+    key_format = 'throttle:%(scope)s:%(ident)s'
+
+    @abc.abstractmethod
+    def get_ident_for(self, request):
+        """The client's bucket key, or None to skip throttling the request."""
+
+    def get_scope(self, view):
+        return self.scope
+
+    def allow_request(self, request, view):
+        self.delay = None
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        ident = self.get_ident_for(request)
+        if rate is None or ident is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        key = self.key_format % {'scope': scope, 'ident': ident}
+        wait = get_store().consume(key, capacity, capacity / period, time.time())
+        if wait:
+            self.delay = wait
+            return False
+        return True
+
+    def wait(self):
+        return self.delay
+
+
+def parse_rate(rate):
+    num, period = rate.split('/')
+    return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    # Every anonymous request, by client address ('anon' rate)
+    scope = 'anon'
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-endpoint limits: views set ``throttle_scope`` and the rate of that
+    scope applies per user, or per client address before login.
+    """
+    def __init__(self, scope=None):
+        self.scope = scope
+
+    def get_scope(self, view):
+        return self.scope or getattr(view, 'throttle_scope', None)
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
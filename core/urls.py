@@ -16,12 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
+
+from .media import media_urlpatterns
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('api.urls')),
     path('api/main/', include('main.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + media_urlpatterns()
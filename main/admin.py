@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Property, PropertyImage
+from .search import search_properties
 
 @admin.register(Property)
 class PropertyAdmin(admin.ModelAdmin):
@@ -7,6 +8,12 @@ class PropertyAdmin(admin.ModelAdmin):
     list_filter = ('property_type', 'status')
     search_fields = ('pid', 'title', 'seller_name')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans over search_fields
+        if not search_term.strip():
+            return queryset, False
+        return search_properties(queryset, search_term), False
+
 @admin.register(PropertyImage)
 class PropertyImageAdmin(admin.ModelAdmin):
     list_display = ('property', 'image')
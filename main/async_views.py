@@ -0,0 +1,127 @@
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from accounts.authentication import token_cache
+from core.renderers import FastJSONRenderer
+from core.throttling import ScopedTokenBucketThrottle
+
+from .cache import LIST_SCOPE, acached_response, detail_scope
+from .filters import ORDERING_FIELDS
+from .models import Property
+from .serializers import PropertySerializer
+from .views import PropertyViewSet
+
+
+class JSONResponse(HttpResponse):
+    # Rendered exactly like the DRF views' JSON
+    renderer = FastJSONRenderer()
+
+    def __init__(self, data=None, status=status.HTTP_200_OK):
+        content = b'' if data is None else self.renderer.render(data)
+        super().__init__(content, status=status, content_type=self.renderer.media_type)
+
+
+def error_response(exc):
+    # Same body as DRF's exception handler
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = JSONResponse(data, status=exc.status_code)
+    if isinstance(exc, exceptions.NotAuthenticated):
+        response['WWW-Authenticate'] = 'Token'
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = str(math.ceil(exc.wait))
+    return response
+
+
+async def aauthenticate(request):
+    """
+    Async counterpart of the API's TokenAuthentication and
+    SessionAuthentication: a ``Token <key>`` header, else the session user.
+    """
+    header = request.headers.get('Authorization', '').split()
+    if header and header[0].lower() == 'token':
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        # A hit reads the shared revocation cache
+        cached = await sync_to_async(token_cache.get)(header[1])
+        if cached is not None:
+            return cached[0]
+        generation, looked_up = token_cache.generation, time.time()
+        token = await Token.objects.select_related('user').filter(key=header[1]).afirst()
+        if token is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        token_cache.set(token.key, token.user, token, generation, looked_up)
+        return token.user
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    return user
+
+
+def get_queryset(fields=None):
+    return PropertySerializer.setup_eager_loading(Property.objects.all(), fields, keep=ORDERING_FIELDS)
+
+
+def api_view(view):
+    """
+    Wrap an async view: authenticate, apply the 'property_list' throttle of
+    the sync endpoints, hand it a DRF Request for query parsing and
+    serializer context, and turn API exceptions into JSON.
+    """
+    throttle = ScopedTokenBucketThrottle('property_list')
+
+    @require_safe
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await aauthenticate(request)
+            # No authenticators: DRF's would query the database synchronously
+            request = Request(request, authenticators=())
+            request.user = user
+            # The bucket lives in a cache (Redis, or a dict under a lock):
+            # don't block the event loop on it
+            if not await sync_to_async(throttle.allow_request)(request, None):
+                raise exceptions.Throttled(throttle.wait())
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+    return wrapper
+
+
+@api_view
+async def property_list(request):
+    """
+    Async version of GET /api/main/properties/: same filters, ordering,
+    cursor pagination, cache and JSON, with every query on the async ORM.
+    """
+    async def build():
+        fields = PropertySerializer.requested_fields(request, 'list')
+        queryset = get_queryset(fields)
+        # Same filter and pagination configuration as the sync viewset
+        for backend in PropertyViewSet.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, PropertyViewSet)
+        paginator = PropertyViewSet.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request, PropertyViewSet)
+        serializer = PropertySerializer(page, many=True, context={'request': request}, fields=fields)
+        return status.HTTP_200_OK, paginator.get_paginated_response(serializer.data).data
+
+    return await acached_response(request, LIST_SCOPE, build, JSONResponse)
+
+
+@api_view
+async def property_detail(request, pid):
+    async def build():
+        fields = PropertySerializer.requested_fields(request)
+        instance = await get_queryset(fields).filter(pid=pid).afirst()
+        if instance is None:
+            return status.HTTP_404_NOT_FOUND, {'detail': 'No Property matches the given query.'}
+        return status.HTTP_200_OK, PropertySerializer(instance, context={'request': request}, fields=fields).data
+
+    return await acached_response(request, detail_scope(pid), build, JSONResponse)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.routers import replica_reads
+
+CACHE_ALIAS = 'property_responses'
+
+# Every list shape shares one scope; each property also has its own, so a
+# write only drops the lists and that property's detail responses.
+LIST_SCOPE = 'list'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def detail_scope(pid):
+    return f'pid:{pid}'
+
+
+def _version_key(scope):
+    return f'property:version:{scope}'
+
+
+def get_version(scope):
+    cache = get_cache()
+    version = cache.get(_version_key(scope))
+    if version is None:
+        # Start from the clock so an evicted counter never reuses old keys
+        cache.add(_version_key(scope), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(scope))
+    return version
+
+
+async def aget_version(scope):
+    cache = get_cache()
+    version = await cache.aget(_version_key(scope))
+    if version is None:
+        await cache.aadd(_version_key(scope), time.time_ns(), timeout=None)
+        version = await cache.aget(_version_key(scope))
+    return version
+
+
+def bump_version(scope):
+    cache = get_cache()
+    try:
+        cache.incr(_version_key(scope))
+    except ValueError:
+        cache.add(_version_key(scope), time.time_ns(), timeout=None)
+
+
+def invalidate(pid=None):
+    """
+    Drop cached list responses, and the detail responses of ``pid``.
+
+    Inside a transaction this happens again on commit, since another
+    request may cache the old rows between the write and the commit.
+    """
+    def bump():
+        bump_version(LIST_SCOPE)
+        if pid:
+            bump_version(detail_scope(pid))
+
+    bump()
+    if connection.in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def _not_modified(request, entry):
+    # ETag only: the entry knows when it was cached, not when its rows
+    # last changed, so it can't answer If-Modified-Since
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or entry['etag'] in etags
+
+
+def _response_key(request, scope, version):
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'property:response:{scope}:{version}:{digest}'
+
+
+def _make_entry(data):
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    return {
+        'data': data,
+        'etag': quote_etag(hashlib.md5(body.encode()).hexdigest()),
+    }
+
+
+def _respond(request, entry, hit, response_class):
+    if _not_modified(request, entry):
+        response = response_class(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = response_class(entry['data'])
+    response['ETag'] = entry['etag']
+    # Clients may keep a copy but must revalidate it with the ETag
+    response['Cache-Control'] = 'private, no-cache'
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def cached_response(request, scope, build):
+    """
+    Serve ``build()``'s response data from the cache, keyed by the scope
+    version and the full request URL (filters, ordering, page and cursor),
+    answering If-None-Match requests with 304 Not Modified.
+    """
+    cache = get_cache()
+    key = _response_key(request, scope, get_version(scope))
+
+    entry = cache.get(key)
+    hit = entry is not None
+    if not hit:
+        reads = replica_reads()
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        entry = _make_entry(response.data)
+        # A replica may not have the writes this version already counts;
+        # its rows are served to this request only
+        if replica_reads() == reads:
+            cache.set(key, entry, settings.PROPERTY_CACHE_TIMEOUT)
+    return _respond(request, entry, hit, Response)
+
+
+async def acached_response(request, scope, build, response_class):
+    """
+    cached_response for async views: ``build`` is a coroutine function
+    returning ``(status, data)`` and responses are made with
+    ``response_class(data, status=...)``.
+    """
+    cache = get_cache()
+    key = _response_key(request, scope, await aget_version(scope))
+
+    entry = await cache.aget(key)
+    hit = entry is not None
+    if not hit:
+        reads = replica_reads()
+        status_code, data = await build()
+        if status_code != status.HTTP_200_OK:
+            return response_class(data, status=status_code)
+        entry = _make_entry(data)
+        if replica_reads() == reads:
+            await cache.aset(key, entry, settings.PROPERTY_CACHE_TIMEOUT)
+    return _respond(request, entry, hit, response_class)
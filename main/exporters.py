@@ -0,0 +1,57 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+# Same columns as PropertySerializer, minus the nested images
+EXPORT_FIELDS = (
+    'pid', 'property_type', 'title', 'seller_name', 'phone_number',
+    'email', 'street_address', 'city', 'state', 'price', 'size',
+    'bedrooms', 'bathrooms', 'built_year', 'legal_document',
+    'map', 'latitude', 'longitude', 'status', 'user', 'action',
+    'created_date', 'transaction_date',
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def export_rows(queryset, chunk_size=2000):
+    """
+    Yield one dict per property straight from the database cursor.
+
+    No model instances are built and rows are fetched ``chunk_size`` at a
+    time, so memory stays flat regardless of the table size.
+    """
+    columns = [field for field in EXPORT_FIELDS if field != 'user']
+    rows = queryset.order_by('pk').values(*columns, username=F('user__username')).iterator(chunk_size=chunk_size)
+    for row in rows:
+        row['user'] = row.pop('username')
+        yield row
+
+
+class Echo:
+    # csv.writer only needs write(); hand each line straight back
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(['' if row[field] is None else row[field] for field in EXPORT_FIELDS])
+
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps({field: row[field] for field in EXPORT_FIELDS}, cls=DjangoJSONEncoder) + '\n'
+
+
+WRITERS = {
+    'csv': stream_csv,
+    'jsonl': stream_jsonl,
+}
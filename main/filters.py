@@ -0,0 +1,165 @@
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .geo import valid_coordinates, within_bbox, within_radius
+from .models import Property
+from .search import search_properties
+
+
+class CoordinatesField(serializers.CharField):
+    """
+    Comma separated numbers, e.g. ``?near=9.03,38.74``.
+    """
+    def __init__(self, count, **kwargs):
+        self.count = count
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        parts = super().to_internal_value(data).split(',')
+        try:
+            numbers = tuple(float(part) for part in parts)
+        except ValueError:
+            numbers = ()
+        if len(numbers) != self.count:
+            raise serializers.ValidationError(f"Expected {self.count} comma separated numbers.")
+        return numbers
+
+
+class PropertyFilterSerializer(serializers.Serializer):
+    property_type = serializers.ChoiceField(choices=Property.PROPERTY_TYPES, required=False)
+    city = serializers.CharField(max_length=100, required=False)
+    state = serializers.CharField(max_length=100, required=False)
+    status = serializers.ChoiceField(choices=Property.STATUS_CHOICES, required=False)
+    action = serializers.ChoiceField(choices=Property.ACTION_CHOICES, required=False)
+    bedrooms = serializers.IntegerField(min_value=0, required=False)
+    min_bedrooms = serializers.IntegerField(min_value=0, required=False)
+    max_bedrooms = serializers.IntegerField(min_value=0, required=False)
+    min_price = serializers.DecimalField(max_digits=15, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=15, decimal_places=2, required=False)
+    min_size = serializers.DecimalField(max_digits=15, decimal_places=2, required=False)
+    max_size = serializers.DecimalField(max_digits=15, decimal_places=2, required=False)
+    # west,south,east,north
+    bbox = CoordinatesField(count=4, required=False)
+    # latitude,longitude plus a radius in km
+    near = CoordinatesField(count=2, required=False)
+    radius = serializers.FloatField(min_value=0, max_value=500, required=False)
+
+    def validate_bbox(self, value):
+        west, south, east, north = value
+        if not (valid_coordinates(south, west) and valid_coordinates(north, east)) or south > north or west > east:
+            raise serializers.ValidationError("Expected west,south,east,north within valid coordinates.")
+        return value
+
+    def validate_near(self, value):
+        if not valid_coordinates(*value):
+            raise serializers.ValidationError("Expected latitude,longitude within valid coordinates.")
+        return value
+
+    def validate(self, data):
+        if 'radius' in data and 'near' not in data:
+            raise serializers.ValidationError({'radius': ["A radius needs a ?near= point."]})
+        return data
+
+
+# Query parameter -> ORM lookup
+FILTER_LOOKUPS = {
+    'property_type': 'property_type',
+    'city': 'city',
+    'state': 'state',
+    'status': 'status',
+    'action': 'action',
+    'bedrooms': 'bedrooms',
+    'min_bedrooms': 'bedrooms__gte',
+    'max_bedrooms': 'bedrooms__lte',
+    'min_price': 'price__gte',
+    'max_price': 'price__lte',
+    'min_size': 'size__gte',
+    'max_size': 'size__lte',
+}
+
+GEO_PARAMS = ('bbox', 'near', 'radius')
+DEFAULT_RADIUS_KM = 5.0
+
+ORDERING_FIELDS = ('created_date', 'price', 'size', 'bedrooms', 'pid')
+DEFAULT_ORDERING = '-created_date'
+
+# Orderings on annotations that only exist alongside their query parameter:
+# full-text rank for ?search= and distance for ?near=
+ANNOTATED_ORDERINGS = {
+    'relevance': 'search_rank',
+    'distance': 'distance',
+}
+
+
+def filter_properties(queryset, params):
+    """
+    Apply the catalogue filters in ``params`` (a QueryDict or plain dict).
+
+    Raises a DRF ValidationError for malformed values so the API answers
+    with a 400 instead of silently ignoring the filter.
+    """
+    names = list(FILTER_LOOKUPS) + list(GEO_PARAMS)
+    data = {name: params.get(name) for name in names if params.get(name) not in (None, '')}
+    serializer = PropertyFilterSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+
+    validated = dict(serializer.validated_data)
+    bbox = validated.pop('bbox', None)
+    near = validated.pop('near', None)
+    radius = validated.pop('radius', DEFAULT_RADIUS_KM)
+
+    lookups = {FILTER_LOOKUPS[name]: value for name, value in validated.items()}
+    queryset = queryset.filter(**lookups)
+    if bbox:
+        queryset = within_bbox(queryset, bbox)
+    if near:
+        queryset = within_radius(queryset, near[0], near[1], radius)
+    return queryset
+
+
+def parse_ordering(value, available=(), default=DEFAULT_ORDERING):
+    """
+    Return ``(field, descending)`` for an ``?ordering=`` value.
+
+    ``available`` lists the annotated orderings the current query supports.
+    """
+    value = value or default
+    if value in ANNOTATED_ORDERINGS:
+        if value not in available:
+            raise serializers.ValidationError(
+                {'ordering': [f"'{value}' ordering is only available with its query parameter."]}
+            )
+        return ANNOTATED_ORDERINGS[value], False
+    field = value.lstrip('-')
+    if field not in ORDERING_FIELDS:
+        raise serializers.ValidationError(
+            {'ordering': [f"Ordering must be one of: {', '.join(ORDERING_FIELDS)}, optionally prefixed with '-'."]}
+        )
+    return field, value.startswith('-')
+
+
+class PropertyFilterBackend(BaseFilterBackend):
+    ordering_param = 'ordering'
+    search_param = 'search'
+
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def get_ordering(self, request):
+        # Searches default to relevance and ?near= queries to distance
+        available = []
+        if request.query_params.get('near'):
+            available.append('distance')
+        if self.get_search_term(request):
+            available.append('relevance')
+        default = available[-1] if available else DEFAULT_ORDERING
+        return parse_ordering(request.query_params.get(self.ordering_param), available, default)
+
+    def filter_queryset(self, request, queryset, view):
+        field, descending = self.get_ordering(request)
+        prefix = '-' if descending else ''
+        queryset = filter_properties(queryset, request.query_params)
+        term = self.get_search_term(request)
+        if term:
+            queryset = search_properties(queryset, term)
+        return queryset.order_by(f'{prefix}{field}', f'{prefix}pid')
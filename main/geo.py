@@ -0,0 +1,107 @@
+import math
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+from django.db import connection
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import ACos, Cos, Least, Radians, Sin
+
+RTREE_TABLE = 'main_property_rtree'
+EARTH_RADIUS_KM = 6371.0
+
+_NUMBER = r'(-?\d{1,3}(?:\.\d+)?)'
+# Coordinate spots in the map links we see: "@9.03,38.74,15z",
+# "!3d9.03!4d38.74" and "?q=9.03,38.74" / "?ll=" / "?query=" / "?center="
+_AT_RE = re.compile(rf'@{_NUMBER},{_NUMBER}')
+_DATA_RE = re.compile(rf'!3d{_NUMBER}!4d{_NUMBER}')
+_PAIR_RE = re.compile(rf'^\s*{_NUMBER}\s*,\s*{_NUMBER}\s*$')
+_QUERY_KEYS = ('q', 'query', 'll', 'center', 'destination')
+
+
+def valid_coordinates(latitude, longitude):
+    return -90 <= latitude <= 90 and -180 <= longitude <= 180
+
+
+def parse_map_coordinates(url):
+    """
+    Return ``(latitude, longitude)`` from a map link, or None when the link
+    carries no explicit coordinates (e.g. a place name or a short link).
+    """
+    if not url:
+        return None
+    decoded = unquote(url)
+    candidates = [match.groups() for match in _DATA_RE.finditer(decoded)]
+    candidates += [match.groups() for match in _AT_RE.finditer(decoded)]
+
+    params = parse_qs(urlparse(url).query)
+    for key in _QUERY_KEYS:
+        for value in params.get(key, []):
+            match = _PAIR_RE.match(value)
+            if match:
+                candidates.append(match.groups())
+
+    for latitude, longitude in candidates:
+        latitude, longitude = float(latitude), float(longitude)
+        if valid_coordinates(latitude, longitude):
+            return latitude, longitude
+    return None
+
+
+def uses_rtree():
+    return connection.vendor == 'sqlite'
+
+
+def bounding_box(latitude, longitude, radius_km):
+    # (west, south, east, north) enclosing a circle of radius_km
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    lng_delta = 180.0 if cos_lat < 1e-9 else min(180.0, lat_delta / cos_lat)
+    return (
+        max(-180.0, longitude - lng_delta),
+        max(-90.0, latitude - lat_delta),
+        min(180.0, longitude + lng_delta),
+        min(90.0, latitude + lat_delta),
+    )
+
+
+def within_bbox(queryset, bbox):
+    """
+    Keep properties inside ``bbox`` = (west, south, east, north).
+
+    On SQLite the candidates come from the R*Tree index; its 32-bit boxes
+    are rounded outwards, so the exact check on the columns follows.
+    """
+    west, south, east, north = bbox
+    queryset = queryset.filter(latitude__range=(south, north), longitude__range=(west, east))
+    if uses_rtree():
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT id FROM {RTREE_TABLE} '
+            'WHERE max_lat >= %s AND min_lat <= %s AND max_lng >= %s AND min_lng <= %s',
+            (south, north, west, east),
+        ))
+    return queryset
+
+
+def distance_expression(latitude, longitude):
+    # Great-circle distance in km (spherical law of cosines)
+    lat = math.radians(latitude)
+    lng = math.radians(longitude)
+    cosine = (
+        Value(math.cos(lat)) * Cos(Radians(F('latitude'))) * Cos(Radians(F('longitude')) - Value(lng))
+        + Value(math.sin(lat)) * Sin(Radians(F('latitude')))
+    )
+    return ExpressionWrapper(
+        Value(EARTH_RADIUS_KM) * ACos(Least(Value(1.0), cosine)),
+        output_field=FloatField(),
+    )
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """
+    Keep properties within ``radius_km`` of a point and annotate their
+    ``distance`` in km. The bounding box narrows the candidates through
+    the spatial index before any distance is computed.
+    """
+    queryset = within_bbox(queryset, bounding_box(latitude, longitude, radius_km))
+    return queryset.annotate(distance=distance_expression(latitude, longitude)).filter(distance__lte=radius_km)
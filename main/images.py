@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import PropertyImage
+
+logger = logging.getLogger(__name__)
+
+# field -> (longest edge in px, Pillow format, file extension)
+VARIANTS = {
+    'thumbnail': (320, 'JPEG', 'jpg'),
+    'medium': (1280, 'JPEG', 'jpg'),
+    'webp': (1280, 'WEBP', 'webp'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PROPERTY_IMAGE_WORKERS,
+                thread_name_prefix='property-images',
+            )
+    return _executor
+
+
+def schedule(image_ids):
+    """
+    Queue images for processing once the transaction that created them
+    commits, so workers never look for rows that are not visible yet.
+    """
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+
+    def submit():
+        if settings.PROPERTY_IMAGE_PROCESSING == 'sync':
+            for image_id in image_ids:
+                process_image(image_id)
+            return
+        executor = get_executor()
+        for image_id in image_ids:
+            executor.submit(_run_in_worker, image_id)
+
+    transaction.on_commit(submit)
+
+
+def _run_in_worker(image_id):
+    try:
+        process_image(image_id)
+    except Exception:
+        logger.exception("Processing property image %s failed", image_id)
+    finally:
+        # Worker threads own their connection; don't leave it open
+        connection.close()
+
+
+def _encode(picture, format, **options):
+    if format == 'JPEG' and picture.mode not in ('RGB', 'L'):
+        picture = picture.convert('RGB')
+    buffer = BytesIO()
+    picture.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def process_image(image_id):
+    """
+    Strip EXIF from the original, record its dimensions and write the
+    thumbnail, medium and WebP variants. Returns True when processed.
+    """
+    try:
+        image = PropertyImage.objects.get(pk=image_id)
+    except PropertyImage.DoesNotExist:
+        return False
+
+    try:
+        with image.image.open('rb') as original:
+            picture = Image.open(original)
+            picture.load()
+    except (OSError, ValueError) as exc:
+        logger.warning("Cannot read property image %s (%s): %s", image_id, image.image.name, exc)
+        return False
+
+    format = picture.format
+    has_exif = bool(picture.getexif())
+    # Bake the EXIF orientation into the pixels before the tags go away
+    picture = ImageOps.exif_transpose(picture)
+
+    if has_exif and format:
+        # Blobs are shared by content, so the stripped copy becomes a new
+        # blob and PropertyImage.save releases the reference to the old one
+        content = _encode(picture, format, quality=95)
+        image.image.save(os.path.basename(image.image.name), ContentFile(content), save=False)
+
+    image.width, image.height = picture.size
+    base = os.path.splitext(os.path.basename(image.image.name))[0]
+    for field, (edge, variant_format, extension) in VARIANTS.items():
+        variant = picture.copy()
+        variant.thumbnail((edge, edge), Image.LANCZOS)
+        content = _encode(variant, variant_format, quality=82, optimize=True)
+        getattr(image, field).save(f'{base}_{field}.{extension}', ContentFile(content), save=False)
+
+    image.processed = True
+    image.save(update_fields=['image', 'width', 'height', 'processed', *VARIANTS])
+    return True
@@ -0,0 +1,156 @@
+import csv
+import json
+import time
+
+from django.db import transaction
+
+from .cache import invalidate
+from .images import schedule
+from .models import ImageBlob, Property, PropertyImage, PropertySequence, PropertyStatistic
+from .serializers import PropertyImportSerializer
+
+
+def detect_format(filename):
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_csv(lines):
+    # CSV rows list their images as "a.jpg|b.jpg"
+    for number, row in enumerate(csv.DictReader(lines), start=1):
+        images = row.pop('images', None)
+        row = {key: value for key, value in row.items() if key and value != ''}
+        if images:
+            row['images'] = images.split('|')
+        yield number, row
+
+
+def read_jsonl(lines):
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, ValueError(f"Invalid JSON: {exc}")
+            continue
+        if not isinstance(row, dict):
+            yield number, ValueError("Each line must be a JSON object")
+            continue
+        yield number, row
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+class PropertyImporter:
+    """
+    Import property rows in batches.
+
+    Each batch is validated row by row, gets its PIDs reserved as one
+    block per property type and is written with bulk_create inside a
+    single transaction. Invalid rows are skipped and reported. Input that
+    can't be decoded or parsed ends the import at that row, which the
+    report flags with ``complete: False``.
+    """
+    batch_size = 500
+
+    def __init__(self, user=None, batch_size=None):
+        self.user = user
+        if batch_size:
+            self.batch_size = batch_size
+        self.created = 0
+        self.errors = []
+
+    def run(self, rows):
+        started = time.perf_counter()
+        total = 0
+        batch = []
+        complete = True
+        try:
+            for number, row in rows:
+                total += 1
+                batch.append((number, row))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # The rest of the file can't be read; keep the rows before it
+            complete = False
+            self.errors.append({'row': total + 1, 'errors': {'non_field_errors': [f"Unreadable input: {exc}"]}})
+        if batch:
+            self.import_batch(batch)
+
+        elapsed = time.perf_counter() - started
+        return {
+            'complete': complete,
+            'rows': total,
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(total / elapsed, 1) if elapsed else None,
+        }
+
+    def import_file(self, lines, format='csv'):
+        return self.run(READERS[format](lines))
+
+    def build(self, number, row):
+        if isinstance(row, Exception):
+            self.errors.append({'row': number, 'errors': {'non_field_errors': [str(row)]}})
+            return None
+
+        serializer = PropertyImportSerializer(data=row)
+        if not serializer.is_valid():
+            self.errors.append({'row': number, 'errors': serializer.errors})
+            return None
+
+        data = dict(serializer.validated_data)
+        image_names = data.pop('images', [])
+        # bulk_create skips PropertyImage.save, which keeps the summary
+        instance = Property(user=self.user, cover_image=image_names[0] if image_names else '',
+                            image_count=len(image_names), **data)
+        instance.apply_derived_fields(None)
+        try:
+            instance.check_type_fields()
+        except ValueError as exc:
+            self.errors.append({'row': number, 'errors': {'non_field_errors': [str(exc)]}})
+            return None
+        return instance, image_names
+
+    def import_batch(self, batch):
+        built = [self.build(number, row) for number, row in batch]
+        built = [item for item in built if item is not None]
+        if not built:
+            return
+
+        with transaction.atomic():
+            self.assign_pids([instance for instance, _ in built])
+            properties = Property.objects.bulk_create([instance for instance, _ in built])
+            images = [
+                PropertyImage(property=instance, image=name)
+                for instance, (_, image_names) in zip(properties, built)
+                for name in image_names
+            ]
+            PropertyImage.objects.bulk_create(images)
+            # bulk_create bypasses save() and sends no post_save signals
+            ImageBlob.acquire(image.image.name for image in images)
+            PropertyStatistic.record_many(instance.get_statistic_values() for instance in properties)
+            invalidate()
+            schedule(image.pk for image in images)
+        self.created += len(properties)
+
+    def assign_pids(self, instances):
+        by_type = {}
+        for instance in instances:
+            by_type.setdefault(instance.property_type, []).append(instance)
+        for property_type, group in by_type.items():
+            numbers = PropertySequence.reserve(property_type, len(group))
+            for instance, number in zip(group, numbers):
+                instance.pid = Property.format_pid(property_type, number)
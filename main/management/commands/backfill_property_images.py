@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.cache import invalidate
+from main.models import Property
+
+
+class Command(BaseCommand):
+    help = "Fill in the cover image and image count of every listing from its images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Listings updated per transaction")
+
+    def handle(self, *args, **options):
+        pks = list(Property.objects.order_by('pk').values_list('pk', flat=True))
+        size = options['batch_size']
+        updated = 0
+        for start in range(0, len(pks), size):
+            # Short transactions so writers are not locked out for the whole run
+            with transaction.atomic():
+                updated += Property.update_image_summary(pks[start:start + size])
+        invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Updated the image summary of {updated} listings."))
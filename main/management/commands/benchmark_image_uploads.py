@@ -0,0 +1,121 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+
+from main.uploads import BoundedMultiPartParser, ImageUploadField
+
+MODES = {
+    'default': "MultiPartParser + serializers.ImageField",
+    'bounded': "BoundedMultiPartParser + ImageUploadField",
+}
+
+
+class Command(BaseCommand):
+    help = "Compare peak RSS of parsing and validating a multi-image upload with the default and bounded pipelines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=12)
+        parser.add_argument('--size', type=int, default=1400, help="Edge of each square test photo in px")
+        parser.add_argument('--measure', choices=MODES, help="Internal: measure one mode on --body")
+        parser.add_argument('--body', help="Internal: path of the encoded multipart body")
+
+    def handle(self, *args, **options):
+        if options['measure']:
+            self.measure(options['measure'], options['body'])
+            return
+
+        # Each mode runs in a fresh interpreter; a peak never goes down
+        with tempfile.NamedTemporaryFile(suffix='.multipart', delete=False) as body:
+            body.write(self.encode_body(options['images'], options['size']))
+        try:
+            size = os.path.getsize(body.name)
+            self.stdout.write(f"{options['images']} photos, {size / 2**20:.1f} MiB request body")
+            for mode, label in MODES.items():
+                result = json.loads(subprocess.run(
+                    [sys.executable, sys.argv[0], 'benchmark_image_uploads', '--measure', mode, '--body', body.name],
+                    check=True, capture_output=True, text=True,
+                ).stdout)
+                outcome = f"rejected ({result['rejected']})" if result['rejected'] else "accepted"
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{label}: {outcome}, peak RSS {result['peak_kib'] / 1024:.1f} MiB "
+                    f"(+{(result['peak_kib'] - result['start_kib']) / 1024:.1f} MiB), {result['elapsed_ms']:.1f} ms"
+                ))
+        finally:
+            os.remove(body.name)
+
+    def encode_body(self, count, edge):
+        files = []
+        for number in range(count):
+            # Noise compresses badly, like a real photo does
+            picture = Image.effect_noise((edge, edge), 64 + number).convert('RGB')
+            buffer = BytesIO()
+            picture.save(buffer, format='JPEG', quality=90)
+            files.append(SimpleUploadedFile(f'photo_{number}.jpg', buffer.getvalue(), content_type='image/jpeg'))
+        return encode_multipart(BOUNDARY, {'title': 'Benchmark', 'image_files': files})
+
+    def measure(self, mode, path):
+        with open(path, 'rb') as body:
+            request = WSGIRequest({
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': '/api/main/properties/',
+                'CONTENT_TYPE': MULTIPART_CONTENT,
+                'CONTENT_LENGTH': str(os.path.getsize(path)),
+                'SERVER_NAME': 'benchmark',
+                'SERVER_PORT': '80',
+                'wsgi.input': body,
+                'wsgi.url_scheme': 'http',
+            })
+            rejected = None
+            start_kib = rss_kib('VmRSS')
+            started = time.perf_counter()
+            try:
+                if mode == 'default':
+                    files = request.FILES.getlist('image_files')
+                    child = serializers.ImageField()
+                else:
+                    parsed = BoundedMultiPartParser().parse(request, MULTIPART_CONTENT, {'request': request})
+                    files = parsed.files.getlist('image_files')
+                    child = ImageUploadField()
+                serializers.ListField(child=child).run_validation(files)
+            except APIException as exc:
+                # What the view would answer: a 413 over the limits, 400 else
+                rejected = f"{exc.status_code} {exc.detail}"
+            except SuspiciousOperation as exc:
+                rejected = f"400 {exc}"
+            elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(json.dumps({
+            'start_kib': start_kib, 'peak_kib': rss_kib('VmHWM'), 'elapsed_ms': elapsed, 'rejected': rejected,
+        }))
+
+
+def rss_kib(field):
+    """
+    The current ('VmRSS') or peak ('VmHWM') resident set size of this
+    process in KiB. Linux keeps ru_maxrss across exec, so a child would
+    report its parent's peak if higher; VmHWM starts over with the new
+    program. Without /proc both fall back to ru_maxrss.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
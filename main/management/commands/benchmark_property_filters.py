@@ -0,0 +1,66 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.benchmarks import scratch_database, timed
+from main.models import Property
+
+CITIES = ['Addis Ababa', 'Adama', 'Bahir Dar', 'Hawassa', 'Mekelle', 'Dire Dawa', 'Gondar', 'Jimma']
+
+
+class Command(BaseCommand):
+    help = "Seed a scratch database and print query plans and timings for the catalogue filters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options['rows'])
+            for label, queryset in self.shapes():
+                elapsed = timed(lambda: list(queryset[:25]))
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{label}: {elapsed:.2f} ms"))
+                self.stdout.write(queryset.explain())
+
+    def seed(self, rows):
+        rng = random.Random(42)
+        counters = {}
+        properties = []
+        for _ in range(rows):
+            property_type = rng.choice(['House', 'Apartment', 'Land'])
+            counters[property_type] = counters.get(property_type, 0) + 1
+            properties.append(Property(
+                pid=Property.format_pid(property_type, counters[property_type]),
+                property_type=property_type,
+                title='Listing',
+                seller_name='Seller',
+                phone_number='0911000000',
+                email='seller@example.com',
+                street_address='Main street',
+                city=rng.choice(CITIES),
+                state='State',
+                price=Decimal(rng.randrange(10_000, 5_000_000)),
+                size=Decimal(rng.randrange(50, 2_000)),
+                bedrooms=rng.randrange(1, 6),
+                action=rng.choice(['Ongoing', 'Ongoing', 'Ongoing', 'Sold']),
+            ))
+        Property.objects.bulk_create(properties, batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(f"Seeded {rows} properties")
+
+    def shapes(self):
+        properties = Property.objects.all()
+        return [
+            ("Ongoing in a city by price", properties.filter(
+                action='Ongoing', city='Adama', price__gte=100_000, price__lte=900_000,
+            ).order_by('price', 'pid')),
+            ("Ongoing houses by price", properties.filter(
+                action='Ongoing', property_type='House', price__lte=1_000_000,
+            ).order_by('price', 'pid')),
+            ("Sold, newest first", properties.filter(action='Sold').order_by('-created_date', '-pid')),
+            ("City and state", properties.filter(state='State', city='Hawassa')),
+            ("Cheapest first", properties.order_by('price', 'pid')),
+        ]
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks import scratch_database, timed
+from core.renderers import FastJSONRenderer
+from main.management.commands.benchmark_property_filters import Command as FilterBenchmark
+from main.models import Property, PropertyImage
+from main.representation import RowSerializer
+from main.serializers import PropertySerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize and render every seeded property with PropertySerializer and JSONRenderer, "
+        "then with the row serializer and FastJSONRenderer; report rows per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--images', type=int, default=2, help="Images per property")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            FilterBenchmark(stdout=self.stdout).seed(options['rows'])
+            PropertyImage.objects.bulk_create([
+                PropertyImage(
+                    property_id=pk, image=f'property/images/{pk}_{i}.jpg', thumbnail=f'property/thumbs/{pk}_{i}.jpg',
+                    width=1600, height=1200,
+                )
+                for pk in Property.objects.values_list('pk', flat=True) for i in range(options['images'])
+            ], batch_size=2000)
+            Property.update_image_summary()
+            request = RequestFactory().get('/api/main/properties/', SERVER_NAME='localhost')
+            rows = RowSerializer(PropertySerializer())
+            queryset = Property.objects.order_by('pid')
+
+            def serializer():
+                page = PropertySerializer.setup_eager_loading(queryset)
+                return PropertySerializer(page, many=True, context={'request': request}).data
+
+            def row_serializer():
+                return rows.serialize(list(rows.queryset(queryset)), request)
+
+            slow, fast = serializer(), row_serializer()
+            if JSONRenderer().render(slow) != FastJSONRenderer().render(fast):
+                raise CommandError("The row serializer's output differs from PropertySerializer's.")
+
+            count, repeat = options['rows'], options['repeat']
+            self.report("PropertySerializer", count, timed(serializer, repeat))
+            self.report("RowSerializer", count, timed(row_serializer, repeat))
+            self.report("JSONRenderer", count, timed(lambda: JSONRenderer().render(slow), repeat))
+            self.report("FastJSONRenderer", count, timed(lambda: FastJSONRenderer().render(fast), repeat))
+            self.report("PropertySerializer + JSONRenderer", count,
+                        timed(lambda: JSONRenderer().render(serializer()), repeat))
+            self.report("RowSerializer + FastJSONRenderer", count,
+                        timed(lambda: FastJSONRenderer().render(row_serializer()), repeat))
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{label}: {count / elapsed * 1000:,.0f} rows/s ({elapsed:.0f} ms)"))
@@ -0,0 +1,99 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+
+from core.benchmarks import scratch_database
+from core.database import serialized_write, sqlite_database
+from main.management.commands.benchmark_property_filters import CITIES, Command as FilterBenchmark
+from main.models import Property, PropertySequence
+
+
+class Command(BaseCommand):
+    help = (
+        "Run property readers and writers side by side under each SQLite profile "
+        "(SQLITE_PROFILES) and report throughput and 'database is locked' failures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--timeout', type=float, default=1,
+                            help="Busy timeout in seconds (short, to surface lock contention)")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            FilterBenchmark(stdout=self.stdout).seed(options['rows'])
+            # The seeded PIDs bypassed the counters; restart them after those
+            PropertySequence.objects.all().delete()
+            self.stdout.write(
+                f"{options['readers']} readers, {options['writers']} writers, {options['seconds']}s per profile"
+            )
+            for name, profile in settings.SQLITE_PROFILES.items():
+                self.use_profile(profile, options['timeout'])
+                # Serialized writes are part of the tuned setup only
+                self.report(name, *self.run(options, serialize=name != 'basic'))
+
+    def use_profile(self, profile, timeout):
+        # Threads open their connections from this shared settings dict
+        connections.close_all()
+        database = sqlite_database(connection.settings_dict['NAME'], profile, timeout)
+        connection.settings_dict.update(database)
+        # Switch the journal mode while nothing else is connected
+        connection.ensure_connection()
+        connection.close()
+
+    def run(self, options, serialize):
+        stop = threading.Event()
+        counts = {'reads': 0, 'writes': 0, 'read_failures': 0, 'write_failures': 0}
+        lock = threading.Lock()
+
+        def read(number):
+            Property.objects.filter(city=CITIES[number % len(CITIES)]).order_by('-price')[:25].count()
+
+        def write(number):
+            Property.objects.filter(pk=number % options['rows'] + 1).update(price=Decimal(100_000 + number))
+            Property.objects.create(
+                property_type='House', title='Benchmark', seller_name='Seller', phone_number='0911000000',
+                email='seller@example.com', street_address='Main street', city=CITIES[number % len(CITIES)],
+                state='State', price=Decimal(250_000), size=Decimal(120), bedrooms=3, bathrooms=2, built_year=2015,
+            )
+
+        def worker(kind, operation):
+            number = 0
+            try:
+                while not stop.is_set():
+                    number += 1
+                    try:
+                        operation(number)
+                    except OperationalError:
+                        key = f'{kind}_failures'
+                    else:
+                        key = f'{kind}s'
+                    with lock:
+                        counts[key] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=('read', read)) for _ in range(options['readers'])]
+        write_operation = serialized_write(write) if serialize else write
+        threads += [threading.Thread(target=worker, args=('write', write_operation)) for _ in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, counts
+
+    def report(self, name, elapsed, counts):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{name}: {counts['reads'] / elapsed:.0f} reads/s, {counts['writes'] / elapsed:.0f} writes/s, "
+            f"{counts['read_failures']} failed reads, {counts['write_failures']} failed writes"
+        ))
@@ -0,0 +1,78 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import ImageBlob, PropertyImage, property_image_path
+from main.storage import property_image_storage
+
+
+class Command(BaseCommand):
+    help = "Delete stored property image files that no image references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help="Keep files written or re-uploaded within this many hours (default 24)")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted without deleting")
+
+    def handle(self, *args, **options):
+        self.storage = property_image_storage()
+        self.cutoff = time.time() - options['grace_hours'] * 3600
+        self.dry_run = options['dry_run']
+
+        blobs = self.collect_blobs()
+        orphans = self.collect_orphans()
+        verb = "Would delete" if self.dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {blobs} unreferenced blobs and {orphans} untracked files"))
+
+    def expired(self, name):
+        try:
+            return os.path.getmtime(self.storage.path(name)) < self.cutoff
+        except FileNotFoundError:
+            return True
+
+    def collect_blobs(self):
+        deleted = 0
+        unreferenced = ImageBlob.objects.filter(ref_count__lte=0).values_list('pk', 'name')
+        for pk, name in unreferenced.iterator():
+            if not self.expired(name):
+                continue
+            deleted += 1
+            if self.dry_run:
+                continue
+            with transaction.atomic():
+                # Re-check: an upload may have picked the blob up again meanwhile
+                removed, _ = ImageBlob.objects.filter(pk=pk, ref_count__lte=0).delete()
+            if removed:
+                self.storage.delete(name)
+            else:
+                deleted -= 1
+        return deleted
+
+    def collect_orphans(self):
+        """
+        Files under the image directory with neither a blob row nor an image
+        pointing at them, e.g. left behind by an upload that rolled back.
+        """
+        known = set(ImageBlob.objects.values_list('name', flat=True))
+        for names in PropertyImage.objects.values_list(*PropertyImage.FILE_FIELDS).iterator():
+            known.update(names)
+
+        deleted = 0
+        for name in self.walk(property_image_path.path.rstrip('/')):
+            if name in known or not self.expired(name):
+                continue
+            deleted += 1
+            if not self.dry_run:
+                self.storage.delete(name)
+        return deleted
+
+    def walk(self, directory):
+        if not self.storage.exists(directory):
+            return
+        directories, files = self.storage.listdir(directory)
+        for filename in files:
+            yield f'{directory}/{filename}'
+        for subdirectory in directories:
+            yield from self.walk(f'{directory}/{subdirectory}')
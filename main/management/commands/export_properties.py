@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from main.exporters import WRITERS, export_rows
+from main.filters import FILTER_LOOKUPS, filter_properties
+from main.models import Property
+
+
+class Command(BaseCommand):
+    help = "Stream every property as CSV or JSONL to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, '-' for stdout")
+        parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+        parser.add_argument('--chunk-size', type=int, default=settings.PROPERTY_EXPORT_CHUNK_SIZE)
+        parser.add_argument('--action', choices=[choice for choice, _ in Property.ACTION_CHOICES])
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='KEY=VALUE',
+            help=f"Same filters as the list endpoint: {', '.join(FILTER_LOOKUPS)}",
+        )
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            key, sep, value = item.partition('=')
+            if not sep or key not in FILTER_LOOKUPS:
+                raise CommandError(f"Invalid filter '{item}'")
+            params[key] = value
+        if options['action']:
+            params['action'] = options['action']
+
+        try:
+            queryset = filter_properties(Property.objects.all(), params)
+        except ValidationError as exc:
+            raise CommandError(str(exc.detail))
+
+        rows = export_rows(queryset, chunk_size=options['chunk_size'])
+        chunks = WRITERS[options['format']](rows)
+
+        if options['path'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+        else:
+            with open(options['path'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
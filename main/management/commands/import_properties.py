@@ -0,0 +1,47 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importers import PropertyImporter, detect_format, READERS
+
+
+class Command(BaseCommand):
+    help = "Bulk import properties from a CSV or JSONL file ('-' reads stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=PropertyImporter.batch_size)
+        parser.add_argument('--user', help="Email of the user that owns the imported listings")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['user']}")
+
+        path = options['path']
+        format = options['format'] or detect_format(path)
+        importer = PropertyImporter(user=user, batch_size=options['batch_size'])
+
+        if path == '-':
+            report = importer.import_file(sys.stdin, format)
+        else:
+            try:
+                with open(path, encoding='utf-8-sig', newline='') as lines:
+                    report = importer.import_file(lines, format)
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} of {report['rows']} rows "
+            f"in {report['seconds']}s ({report['rows_per_second']} rows/sec)"
+        ))
+        if not report['complete']:
+            raise CommandError(f"Stopped at row {report['errors'][-1]['row']}: the file could not be read further.")
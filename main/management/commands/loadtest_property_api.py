@@ -0,0 +1,146 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from accounts.models import CustomUser
+from core.benchmarks import scratch_database
+from main.management.commands.benchmark_property_filters import Command as FilterBenchmark
+
+# Query strings cycled through by every run
+QUERIES = [
+    '',
+    '?ordering=price',
+    '?city=Adama&ordering=price',
+    '?property_type=House&max_price=1000000',
+    '?action=Sold',
+    '?page_size=50&ordering=-price',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the sync property list through the WSGI handler and the async one "
+        "through the ASGI handler at the same concurrency; report throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--cached', action='store_true', help="Keep the response cache on (default: every request misses)")
+
+    def handle(self, *args, **options):
+        overrides = {
+            # Scopes without a rate are not throttled: measure the handlers,
+            # not the per-user limits every request here would hit
+            'REST_FRAMEWORK': {
+                **settings.REST_FRAMEWORK,
+                'DEFAULT_THROTTLE_RATES': dict.fromkeys(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']),
+            },
+        }
+        if not options['cached']:
+            overrides['CACHES'] = {
+                **settings.CACHES,
+                'property_responses': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            }
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['*'], **overrides):
+            FilterBenchmark(stdout=self.stdout).seed(options['rows'])
+            user = CustomUser.objects.create_user(username='loadtest', email='loadtest@example.com', password='x')
+            token = Token.objects.get_or_create(user=user)[0].key
+
+            count, concurrency = options['requests'], options['concurrency']
+            self.stdout.write(f"{count} requests, {concurrency} concurrent")
+            self.report('WSGI sync', *self.run_wsgi('/api/main/properties/', token, count, concurrency))
+            self.report('ASGI async', *self.run_asgi('/api/main/async/properties/', token, count, concurrency))
+
+    def report(self, label, elapsed, latencies, failures):
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{label}: {len(latencies) / elapsed:.0f} req/s, p50 {statistics.median(latencies):.1f} ms, "
+            f"p99 {p99:.1f} ms, {failures} failed"
+        ))
+
+    def run_wsgi(self, path, token, count, concurrency):
+        handler = WSGIHandler()
+
+        def request(number):
+            path_info, _, query = (path + QUERIES[number % len(QUERIES)]).partition('?')
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path_info, 'QUERY_STRING': query,
+                'SERVER_NAME': 'loadtest', 'SERVER_PORT': '80', 'HTTP_AUTHORIZATION': f'Token {token}',
+                'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http',
+            }
+            statuses = []
+            started = time.perf_counter()
+            body = handler(environ, lambda status, headers: statuses.append(status))
+            b''.join(body)
+            body.close()
+            return (time.perf_counter() - started) * 1000, statuses[0].startswith('200')
+
+        def worker(number):
+            try:
+                return request(number)
+            finally:
+                # Pool threads are reused; mirror a server thread's request cycle
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(worker, range(count)))
+        return time.perf_counter() - started, [ms for ms, _ in results], sum(not ok for _, ok in results)
+
+    def run_asgi(self, path, token, count, concurrency):
+        handler = ASGIHandler()
+
+        async def request(number):
+            path_info, _, query = (path + QUERIES[number % len(QUERIES)]).partition('?')
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': path_info, 'query_string': query.encode(),
+                'headers': [(b'authorization', f'Token {token}'.encode()), (b'host', b'loadtest')],
+                'server': ('loadtest', 80), 'scheme': 'http',
+            }
+            messages = []
+            requested = False
+            done = asyncio.Event()
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Like a server, report the disconnect only once answered
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if message['type'] == 'http.response.body' and not message.get('more_body'):
+                    done.set()
+
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            return (time.perf_counter() - started) * 1000, messages[0]['status'] == 200
+
+        async def run():
+            gate = asyncio.Semaphore(concurrency)
+
+            async def limited(number):
+                async with gate:
+                    return await request(number)
+
+            return await asyncio.gather(*(limited(number) for number in range(count)))
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        return time.perf_counter() - started, [ms for ms, _ in results], sum(not ok for _, ok in results)
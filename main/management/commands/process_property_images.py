@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from main.images import process_image
+from main.models import PropertyImage
+
+
+class Command(BaseCommand):
+    help = "Generate variants for property images the background pipeline has not processed yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Reprocess every image, not just pending ones")
+
+    def handle(self, *args, **options):
+        images = PropertyImage.objects.all()
+        if not options['all']:
+            images = images.filter(processed=False)
+
+        processed = failed = 0
+        for image_id in images.values_list('pk', flat=True).iterator():
+            if process_image(image_id):
+                processed += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} images, {failed} could not be read"))
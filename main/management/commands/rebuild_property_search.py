@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.search import rebuild_index, uses_fts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for properties from the property table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-optimize', action='store_true', help="Skip merging index segments afterwards")
+
+    def handle(self, *args, **options):
+        if not uses_fts():
+            self.stdout.write("The database has no full-text index; nothing to rebuild.")
+            return
+        rebuild_index(optimize=not options['no_optimize'])
+        self.stdout.write(self.style.SUCCESS("Property search index rebuilt."))
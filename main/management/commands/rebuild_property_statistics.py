@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.cache import invalidate
+from main.models import PropertyStatistic
+
+
+class Command(BaseCommand):
+    help = "Recount the market statistics summary table from the property table, or check it against a recount."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report rows that differ from a recount")
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rows = PropertyStatistic.rebuild()
+            # The statistics endpoint caches with the lists
+            invalidate()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} statistics rows."))
+            return
+
+        differences = PropertyStatistic.find_inconsistencies()
+        for (city, property_type, month, action), stored, expected in differences:
+            self.stdout.write(f"{city} / {property_type} / {month:%Y-%m} / {action}: stored {stored}, expected {expected}")
+        if differences:
+            raise CommandError(f"{len(differences)} statistics rows are inconsistent; run without --check to rebuild.")
+        self.stdout.write(self.style.SUCCESS("Statistics are consistent."))
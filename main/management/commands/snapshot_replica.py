@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import snapshot_replica
+
+
+class Command(BaseCommand):
+    help = "Copy the primary database into the local stand-in replica, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='replica', help="Replica alias to refresh")
+        parser.add_argument('--interval', type=float, help="Keep refreshing, this many seconds apart")
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in connections or connections[alias].vendor != 'sqlite':
+            raise CommandError(f"'{alias}' is not a SQLite database alias.")
+
+        while True:
+            started = time.perf_counter()
+            snapshot_replica(alias)
+            self.stdout.write(f"Snapshot of the primary copied to '{alias}' in {(time.perf_counter() - started) * 1000:.0f} ms")
+            if not options['interval']:
+                return
+            time.sleep(max(0, options['interval'] - (time.perf_counter() - started)))
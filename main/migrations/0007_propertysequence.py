@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:43
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_sequences(apps, schema_editor):
+    Property = apps.get_model('main', 'Property')
+    PropertySequence = apps.get_model('main', 'PropertySequence')
+    for property_type in ('House', 'Apartment', 'Land'):
+        last_pid = Property.objects.filter(property_type=property_type).aggregate(last=Max('pid'))['last']
+        PropertySequence.objects.create(
+            property_type=property_type,
+            last_number=int(last_pid[1:]) if last_pid else 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_property_created_pid_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertySequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('property_type', models.CharField(max_length=20, unique=True)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
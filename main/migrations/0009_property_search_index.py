@@ -0,0 +1,54 @@
+from django.db import migrations
+
+COLUMNS = 'title, street_address, city, state, seller_name, pid'
+NEW_VALUES = 'new.id, new.title, new.street_address, new.city, new.state, new.seller_name, new.pid'
+OLD_VALUES = 'old.id, old.title, old.street_address, old.city, old.state, old.seller_name, old.pid'
+
+# External-content FTS5 index over main_property, kept in sync by triggers so
+# ORM saves, bulk_create, queryset.update() and deletes are all covered.
+FORWARD_SQL = [
+    f"""CREATE VIRTUAL TABLE main_property_fts USING fts5(
+        {COLUMNS}, content='main_property', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER main_property_fts_insert AFTER INSERT ON main_property BEGIN
+        INSERT INTO main_property_fts(rowid, {COLUMNS}) VALUES ({NEW_VALUES});
+    END""",
+    f"""CREATE TRIGGER main_property_fts_delete AFTER DELETE ON main_property BEGIN
+        INSERT INTO main_property_fts(main_property_fts, rowid, {COLUMNS}) VALUES ('delete', {OLD_VALUES});
+    END""",
+    f"""CREATE TRIGGER main_property_fts_update AFTER UPDATE OF {COLUMNS} ON main_property BEGIN
+        INSERT INTO main_property_fts(main_property_fts, rowid, {COLUMNS}) VALUES ('delete', {OLD_VALUES});
+        INSERT INTO main_property_fts(rowid, {COLUMNS}) VALUES ({NEW_VALUES});
+    END""",
+    "INSERT INTO main_property_fts(main_property_fts) VALUES ('rebuild')",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS main_property_fts_update",
+    "DROP TRIGGER IF EXISTS main_property_fts_delete",
+    "DROP TRIGGER IF EXISTS main_property_fts_insert",
+    "DROP TABLE IF EXISTS main_property_fts",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # SQLite only: other databases fall back to icontains matching in
+        # main.search and to the (latitude, longitude) B-tree index
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_property_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD_SQL), run(REVERSE_SQL)),
+    ]
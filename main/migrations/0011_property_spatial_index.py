@@ -0,0 +1,85 @@
+import importlib
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+from django.db import migrations
+
+# One helper for the raw SQL of both index migrations
+run = importlib.import_module('main.migrations.0009_property_search_index').run
+
+# R*Tree over the coordinates, kept in sync by triggers like the FTS index
+FORWARD_SQL = [
+    "CREATE VIRTUAL TABLE main_property_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+    """CREATE TRIGGER main_property_rtree_insert AFTER INSERT ON main_property
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO main_property_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END""",
+    """CREATE TRIGGER main_property_rtree_delete AFTER DELETE ON main_property BEGIN
+        DELETE FROM main_property_rtree WHERE id = old.id;
+    END""",
+    """CREATE TRIGGER main_property_rtree_update AFTER UPDATE OF latitude, longitude ON main_property BEGIN
+        DELETE FROM main_property_rtree WHERE id = old.id;
+        INSERT INTO main_property_rtree
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+    """INSERT INTO main_property_rtree
+        SELECT id, latitude, latitude, longitude, longitude FROM main_property
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL""",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS main_property_rtree_update",
+    "DROP TRIGGER IF EXISTS main_property_rtree_delete",
+    "DROP TRIGGER IF EXISTS main_property_rtree_insert",
+    "DROP TABLE IF EXISTS main_property_rtree",
+]
+
+
+# main.geo.parse_map_coordinates as of this migration
+_NUMBER = r'(-?\d{1,3}(?:\.\d+)?)'
+_AT_RE = re.compile(rf'@{_NUMBER},{_NUMBER}')
+_DATA_RE = re.compile(rf'!3d{_NUMBER}!4d{_NUMBER}')
+_PAIR_RE = re.compile(rf'^\s*{_NUMBER}\s*,\s*{_NUMBER}\s*$')
+_QUERY_KEYS = ('q', 'query', 'll', 'center', 'destination')
+
+
+def parse_map_coordinates(url):
+    if not url:
+        return None
+    decoded = unquote(url)
+    candidates = [match.groups() for match in _DATA_RE.finditer(decoded)]
+    candidates += [match.groups() for match in _AT_RE.finditer(decoded)]
+
+    params = parse_qs(urlparse(url).query)
+    for key in _QUERY_KEYS:
+        for value in params.get(key, []):
+            match = _PAIR_RE.match(value)
+            if match:
+                candidates.append(match.groups())
+
+    for latitude, longitude in candidates:
+        latitude, longitude = float(latitude), float(longitude)
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return latitude, longitude
+    return None
+
+
+def backfill_coordinates(apps, schema_editor):
+    Property = apps.get_model('main', 'Property')
+    for prop in Property.objects.exclude(map__isnull=True).exclude(map='').only('id', 'map'):
+        coordinates = parse_map_coordinates(prop.map)
+        if coordinates:
+            Property.objects.filter(pk=prop.pk).update(latitude=coordinates[0], longitude=coordinates[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_property_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_coordinates, migrations.RunPython.noop),
+        migrations.RunPython(run(FORWARD_SQL), run(REVERSE_SQL)),
+    ]
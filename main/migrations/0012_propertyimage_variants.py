@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_property_spatial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='medium',
+            field=models.ImageField(blank=True, editable=False, upload_to='property/images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='processed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='property/images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='webp',
+            field=models.ImageField(blank=True, editable=False, upload_to='property/images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:01
+
+import main.models
+import main.storage
+from django.db import migrations, models
+
+FILE_FIELDS = ('image', 'thumbnail', 'medium', 'webp')
+
+
+def count_references(apps, schema_editor):
+    PropertyImage = apps.get_model('main', 'PropertyImage')
+    ImageBlob = apps.get_model('main', 'ImageBlob')
+    counts = {}
+    for names in PropertyImage.objects.values_list(*FILE_FIELDS).iterator():
+        for name in names:
+            if name:
+                counts[name] = counts.get(name, 0) + 1
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name, ref_count=count) for name, count in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_propertyimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(storage=main.storage.property_image_storage, upload_to=main.models.PathAndRename('property/images/')),
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='medium',
+            field=models.ImageField(blank=True, editable=False, storage=main.storage.property_image_storage, upload_to='property/images/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, storage=main.storage.property_image_storage, upload_to='property/images/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='webp',
+            field=models.ImageField(blank=True, editable=False, storage=main.storage.property_image_storage, upload_to='property/images/variants/'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:14
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# The bucketing of PropertyStatistic.contribution() as of this migration
+SOURCE_FIELDS = ('city', 'property_type', 'action', 'created_date', 'transaction_date', 'price', 'size')
+COUNTERS = ('count', 'price_sum', 'size_sum', 'timed_sale_count', 'days_to_sale_sum')
+
+
+def populate(apps, schema_editor):
+    Property = apps.get_model('main', 'Property')
+    PropertyStatistic = apps.get_model('main', 'PropertyStatistic')
+    totals = {}
+    for values in Property.objects.values(*SOURCE_FIELDS).order_by().iterator(chunk_size=2000):
+        sold = values['action'] == 'Sold'
+        date = values['transaction_date'] if sold and values['transaction_date'] else values['created_date']
+        if date is None:
+            continue
+        timed = sold and values['transaction_date'] and values['created_date']
+        key = (values['city'], values['property_type'], date.replace(day=1), values['action'])
+        row = totals.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        row['count'] += 1
+        row['price_sum'] += Decimal(values['price'] or 0)
+        row['size_sum'] += Decimal(values['size'] or 0)
+        if timed:
+            row['timed_sale_count'] += 1
+            row['days_to_sale_sum'] += (values['transaction_date'] - values['created_date']).days
+    PropertyStatistic.objects.bulk_create(
+        [
+            PropertyStatistic(city=city, property_type=property_type, month=month, action=action, **row)
+            for (city, property_type, month, action), row in totals.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_imageblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('property_type', models.CharField(choices=[('House', 'House'), ('Apartment', 'Apartment'), ('Land', 'Land')], max_length=20)),
+                ('month', models.DateField()),
+                ('action', models.CharField(choices=[('Ongoing', 'Ongoing'), ('Sold', 'Sold')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('size_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('timed_sale_count', models.IntegerField(default=0)),
+                ('days_to_sale_sum', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='property_statistic_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('city', 'property_type', 'month', 'action'), name='property_statistic_key')],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
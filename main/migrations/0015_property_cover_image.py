@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+import importlib
+
+import main.storage
+from django.db import migrations, models
+
+search_index = importlib.import_module('main.migrations.0009_property_search_index')
+spatial_index = importlib.import_module('main.migrations.0011_property_spatial_index')
+
+# Adding (or removing) NOT NULL columns makes SQLite rebuild main_property,
+# which drops the triggers keeping the FTS and R*Tree indexes in sync. The
+# indexes themselves key on the ids the rebuild keeps.
+TRIGGER_SQL = [
+    *[statement for statement in search_index.REVERSE_SQL + spatial_index.REVERSE_SQL if statement.startswith('DROP TRIGGER')],
+    *[statement for statement in search_index.FORWARD_SQL + spatial_index.FORWARD_SQL if statement.startswith('CREATE TRIGGER')],
+]
+restore_triggers = search_index.run(TRIGGER_SQL)
+
+
+def populate_cover_image(apps, schema_editor):
+    # The first image's thumbnail once the pipeline has made one, else the
+    # original
+    Property = apps.get_model('main', 'Property')
+    PropertyImage = apps.get_model('main', 'PropertyImage')
+    listing = schema_editor.quote_name(Property._meta.db_table)
+    images = schema_editor.quote_name(PropertyImage._meta.db_table)
+    schema_editor.execute(
+        f"UPDATE {listing} SET cover_image = COALESCE(("
+        f"SELECT COALESCE(NULLIF(thumbnail, ''), image) FROM {images} "
+        f"WHERE {images}.property_id = {listing}.id ORDER BY {images}.id LIMIT 1"
+        f"), '')"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_propertystatistic'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='property',
+            name='cover_image',
+            field=models.ImageField(blank=True, editable=False, storage=main.storage.property_image_storage, upload_to=''),
+        ),
+        migrations.RunPython(populate_cover_image, migrations.RunPython.noop),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
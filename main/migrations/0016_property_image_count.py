@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+import importlib
+
+from django.db import migrations, models
+
+# SQLite rebuilds main_property for the new column and drops its triggers
+restore_triggers = importlib.import_module('main.migrations.0015_property_cover_image').restore_triggers
+
+
+def populate_image_count(apps, schema_editor):
+    Property = apps.get_model('main', 'Property')
+    PropertyImage = apps.get_model('main', 'PropertyImage')
+    listing = schema_editor.quote_name(Property._meta.db_table)
+    images = schema_editor.quote_name(PropertyImage._meta.db_table)
+    schema_editor.execute(
+        f"UPDATE {listing} SET image_count = ("
+        f"SELECT COUNT(*) FROM {images} WHERE {images}.property_id = {listing}.id"
+        f")"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_property_cover_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='property',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_image_count, migrations.RunPython.noop),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,18 @@ import os
 import time
 import random
 import string
+from decimal import Decimal
 from django.db import IntegrityError, transaction
+from django.db.models import CharField, Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.utils import timezone
 from django.db import models
 from django.conf import settings
-from django.core.validators import MinValueValidator, URLValidator
+from django.core.validators import MaxValueValidator, MinValueValidator, URLValidator
 from django.core.exceptions import ValidationError
 from django.utils.deconstruct import deconstructible
+from .geo import parse_map_coordinates
+from .storage import property_image_storage
 from rest_framework import serializers, viewsets
 from rest_framework.parsers import MultiPartParser, FormParser
 
@@ -26,6 +31,54 @@ class PathAndRename(object):
         return os.path.join(self.path, filename)
 
 property_image_path = PathAndRename('property/images/')
+property_image_variant_path = 'property/images/variants/'
+
+# Per-type PID counter
+class PropertySequence(models.Model):
+    property_type = models.CharField(max_length=20, unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, property_type, count=1):
+        """
+        Atomically reserve ``count`` consecutive PID numbers for
+        ``property_type`` and return them as a range.
+
+        The counter row is bumped with a single UPDATE, which takes the row
+        (or, on SQLite, the database) write lock until the surrounding
+        transaction ends, so concurrent creates never see the same number.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+
+        with transaction.atomic():
+            updated = cls.objects.filter(property_type=property_type).update(
+                last_number=F('last_number') + count
+            )
+            if not updated:
+                cls.seed(property_type)
+                return cls.reserve(property_type, count)
+            last_number = cls.objects.values_list('last_number', flat=True).get(
+                property_type=property_type
+            )
+        return range(last_number - count + 1, last_number + 1)
+
+    @classmethod
+    def seed(cls, property_type):
+        # Start a missing counter after the highest PID already issued.
+        last_pid = Property.objects.filter(property_type=property_type).aggregate(last=Max('pid'))['last']
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    property_type=property_type,
+                    last_number=int(last_pid[1:]) if last_pid else 0,
+                )
+        except IntegrityError:
+            # Another writer created it first
+            pass
+
+    def __str__(self):
+        return f"{self.property_type} - {self.last_number}"
 
 # Property Model
 class Property(models.Model):
@@ -64,6 +117,17 @@ class Property(models.Model):
         validators=[URLValidator()],
         help_text="URL to map location (e.g., Google Maps link)"
     )
+    # Filled from the map link when it carries coordinates, or set directly
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -89,30 +153,121 @@ class Property(models.Model):
     built_year = models.PositiveIntegerField(null=True, blank=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='properties')
 
-    def generate_pid(self):
-        prefix = self.property_type[0].upper()  # H, A, or L
-        last_property = Property.objects.filter(
-            property_type=self.property_type
-        ).order_by('pid').last()
-        
-        if not last_property:
-            number = 1
-        else:
-            number = int(last_property.pid[1:]) + 1
-        
+    # Summary of the images for list views, kept by PropertyImage.save and
+    # the image delete signal (update_image_summary)
+    cover_image = models.ImageField(storage=property_image_storage, blank=True, editable=False)
+    image_count = models.PositiveIntegerField(default=0, editable=False)
+
+    @staticmethod
+    def format_pid(property_type, number):
+        prefix = property_type[0].upper()  # H, A, or L
         return f"{prefix}{number:06d}"
 
+    def generate_pid(self):
+        number = PropertySequence.reserve(self.property_type)[0]
+        return self.format_pid(self.property_type, number)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.remember_loaded_values(fields)
+
+    def remember_loaded_values(self, fields=None):
+        # Snapshot the stored values so save() can tell what changed
+        # without reading the row back.
+        deferred = self.get_deferred_fields()
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        deferred = self.get_deferred_fields()
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if field.attname not in deferred
+            and (field.attname not in loaded or getattr(self, field.attname) != loaded[field.attname])
+        ]
+
     def save(self, *args, **kwargs):
-        if self.pk:
-            old_instance = Property.objects.get(pk=self.pk)
-            old_action = old_instance.action
-        else:
+        if self.pid and not self._state.adding:
+            return self._save(*args, **kwargs)
+        # Allocate the PID and count the listing in the same transaction
+        # as the insert
+        allocated = not self.pid
+        try:
+            with transaction.atomic():
+                return self._save(*args, **kwargs)
+        except BaseException:
+            # The rollback handed the PID back to the sequence, which will
+            # issue it again
+            if allocated:
+                self.pid = ''
+            raise
+
+    def _save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_values', None)
+        if self.pk is None:
             old_action = None
+        elif loaded is not None and 'action' in loaded:
+            old_action = loaded['action']
+        else:
+            # Not loaded through the ORM; read the stored action instead
+            old_action = Property.objects.filter(pk=self.pk).values_list('action', flat=True).first()
 
         if not self.pid:
             self.pid = self.generate_pid()
             
+        adding = self._state.adding
+        old_statistics = None if adding else self.get_stored_statistic_values(loaded)
+        self.apply_derived_fields(old_action, loaded)
+        self.check_type_fields()
+
+        if not adding and loaded is not None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = self.get_changed_update_fields(kwargs.get('update_fields'))
+
+        new_statistics = self.get_statistic_values()
+        if old_statistics is not None and kwargs.get('update_fields') is not None:
+            # Columns left out of the update keep their stored values
+            saved = set(kwargs['update_fields'])
+            new_statistics = {
+                name: value if name in saved else old_statistics[name]
+                for name, value in new_statistics.items()
+            }
+        if adding or old_statistics == new_statistics:
+            super().save(*args, **kwargs)
+            if adding:
+                PropertyStatistic.record(None, self.get_statistic_values())
+        else:
+            # Move the listing between summary rows atomically with the save
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                PropertyStatistic.record(old_statistics, new_statistics)
+        self.remember_loaded_values(kwargs.get('update_fields'))
+
+    def get_statistic_values(self):
+        return {name: getattr(self, name) for name in PropertyStatistic.SOURCE_FIELDS}
+
+    def get_stored_statistic_values(self, loaded=None):
+        if loaded is not None and all(name in loaded for name in PropertyStatistic.SOURCE_FIELDS):
+            return {name: loaded[name] for name in PropertyStatistic.SOURCE_FIELDS}
+        return Property.objects.filter(pk=self.pk).values(*PropertyStatistic.SOURCE_FIELDS).first()
+
+    def apply_derived_fields(self, old_action, loaded=None):
         self.status = 'Active' if self.map else 'Pending'
+        self.update_coordinates(loaded)
 
         # Handle transaction date
         if old_action != self.action:  # If action has changed
@@ -121,6 +276,20 @@ class Property(models.Model):
             elif self.action == 'Ongoing' and old_action == 'Sold':
                 self.transaction_date = None
 
+    def update_coordinates(self, loaded=None):
+        # Follow the map link unless the coordinates were set directly
+        if loaded is None:
+            supplied = self.latitude is not None and self.longitude is not None
+            map_changed = True
+        else:
+            supplied = (self.latitude, self.longitude) != (loaded.get('latitude'), loaded.get('longitude'))
+            map_changed = self.map != loaded.get('map')
+        if supplied or not map_changed:
+            return
+        coordinates = parse_map_coordinates(self.map)
+        self.latitude, self.longitude = coordinates or (None, None)
+
+    def check_type_fields(self):
         if self.property_type == 'House':
             if self.bedrooms is None:
                 raise ValueError("Number of bedrooms is required for houses")
@@ -128,8 +297,43 @@ class Property(models.Model):
                 raise ValueError("Number of bathrooms is required for houses")
             if self.built_year is None:
                 raise ValueError("Built year is required for houses")
-                
-        super().save(*args, **kwargs)
+
+    def get_changed_update_fields(self, update_fields=None):
+        """
+        Narrow an update to the columns that differ from the loaded row.
+
+        ``status``, the coordinates and ``transaction_date`` are derived in
+        save(), so they follow ``map`` and ``action`` when an explicit list
+        is given.
+        """
+        dirty = self.get_dirty_fields()
+        if update_fields is None:
+            return dirty
+
+        requested = {self._meta.get_field(name).attname for name in update_fields}
+        if 'map' in requested:
+            requested.update(('status', 'latitude', 'longitude'))
+        if 'action' in requested:
+            requested.add('transaction_date')
+        return [name for name in dirty if name in requested]
+
+    @classmethod
+    def update_image_summary(cls, pks=None):
+        """
+        Recompute ``cover_image`` (the first image: its thumbnail once the
+        pipeline has made one, else the original) and ``image_count`` for
+        the listings in ``pks``, or all of them, in one UPDATE.
+        """
+        images = PropertyImage.objects.filter(property=OuterRef('pk')).order_by()
+        cover = images.order_by('pk').values(
+            name=Coalesce(NullIf('thumbnail', Value('')), 'image', output_field=CharField()),
+        )[:1]
+        count = images.values('property').annotate(count=Count('pk')).values('count')
+        queryset = cls.objects.all() if pks is None else cls.objects.filter(pk__in=pks)
+        return queryset.update(
+            cover_image=Coalesce(Subquery(cover), Value('')),
+            image_count=Coalesce(Subquery(count), 0),
+        )
 
     def __str__(self):
         return f"{self.pid} - {self.property_type} - {self.title}"
@@ -137,12 +341,232 @@ class Property(models.Model):
     class Meta:
         verbose_name = "Property"
         verbose_name_plural = "Properties"
+        indexes = [
+            # Backs the keyset pagination order of the catalogue
+            models.Index(fields=['created_date', 'pid'], name='property_created_pid_idx'),
+            models.Index(fields=['price', 'pid'], name='property_price_pid_idx'),
+            # Ongoing/sold listings, newest first
+            models.Index(fields=['action', 'created_date', 'pid'], name='property_action_created_idx'),
+            # Common filter combinations, with pid as the keyset tiebreaker
+            models.Index(fields=['action', 'city', 'price', 'pid'], name='property_action_city_idx'),
+            models.Index(fields=['action', 'property_type', 'price', 'pid'], name='property_action_type_idx'),
+            models.Index(fields=['state', 'city'], name='property_state_city_idx'),
+            # Range fallback for databases without the SQLite R*Tree
+            models.Index(fields=['latitude', 'longitude'], name='property_lat_lng_idx'),
+        ]
 
 # PropertyImage Model
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to=property_image_path)
+    image = models.ImageField(upload_to=property_image_path, storage=property_image_storage)
+
+    # Filled in by the background pipeline in main.images
+    processed = models.BooleanField(default=False)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    thumbnail = models.ImageField(upload_to=property_image_variant_path, storage=property_image_storage, blank=True, editable=False)
+    medium = models.ImageField(upload_to=property_image_variant_path, storage=property_image_storage, blank=True, editable=False)
+    webp = models.ImageField(upload_to=property_image_variant_path, storage=property_image_storage, blank=True, editable=False)
+
+    FILE_FIELDS = ('image', 'thumbnail', 'medium', 'webp')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_files = instance.get_file_names()
+        return instance
+
+    def get_file_names(self, fields=FILE_FIELDS):
+        deferred = self.get_deferred_fields()
+        return {field: getattr(self, field).name or '' for field in fields if field not in deferred}
+
+    def save(self, *args, **kwargs):
+        # Move blob references along with the file fields in one transaction
+        stored = getattr(self, '_stored_files', {})
+        update_fields = kwargs.get('update_fields')
+        fields = [field for field in self.FILE_FIELDS if update_fields is None or field in update_fields]
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            current = self.get_file_names(fields)
+            ImageBlob.acquire([name for field, name in current.items() if name and name != stored.get(field)])
+            ImageBlob.release([stored[field] for field in current if stored.get(field) and stored[field] != current[field]])
+            # The listing's cover is the first image's thumbnail or original
+            if adding or any(field in current and current[field] != stored.get(field) for field in ('image', 'thumbnail')):
+                Property.update_image_summary([self.property_id])
+        self._stored_files = {**stored, **current}
     
     def __str__(self):
         return f"Image for {self.property.pid}"
 
+
+# Market summary per (city, property type, month, action), maintained
+# incrementally by Property.save/delete and the importer
+class PropertyStatistic(models.Model):
+    SOURCE_FIELDS = ('city', 'property_type', 'action', 'created_date', 'transaction_date', 'price', 'size')
+
+    city = models.CharField(max_length=100)
+    property_type = models.CharField(max_length=20, choices=Property.PROPERTY_TYPES)
+    # First day of the listing month, or of the sale month for sold listings
+    month = models.DateField()
+    action = models.CharField(max_length=20, choices=Property.ACTION_CHOICES)
+    count = models.IntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    size_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    # Sold listings with both dates, and their total days on the market
+    timed_sale_count = models.IntegerField(default=0)
+    days_to_sale_sum = models.IntegerField(default=0)
+
+    COUNTERS = ('count', 'price_sum', 'size_sum', 'timed_sale_count', 'days_to_sale_sum')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'property_type', 'month', 'action'], name='property_statistic_key'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='property_statistic_month_idx'),
+        ]
+
+    @classmethod
+    def contribution(cls, values):
+        """
+        The summary row key and counter values one listing adds, or None
+        for listings without a date to file them under.
+        """
+        if values is None:
+            return None
+        sold = values['action'] == 'Sold'
+        date = values['transaction_date'] if sold and values['transaction_date'] else values['created_date']
+        if date is None:
+            return None
+        timed = sold and values['transaction_date'] and values['created_date']
+        key = (values['city'], values['property_type'], date.replace(day=1), values['action'])
+        return key, {
+            'count': 1,
+            # Unsaved instances may still hold the strings they were given
+            'price_sum': Decimal(str(values['price'] or 0)),
+            'size_sum': Decimal(str(values['size'] or 0)),
+            'timed_sale_count': 1 if timed else 0,
+            'days_to_sale_sum': (values['transaction_date'] - values['created_date']).days if timed else 0,
+        }
+
+    @classmethod
+    def collect(cls, listings, totals=None, sign=1):
+        # Sum the contributions of ``listings`` (value dicts) per key
+        totals = {} if totals is None else totals
+        for values in listings:
+            contribution = cls.contribution(values)
+            if contribution is None:
+                continue
+            key, counters = contribution
+            row = totals.setdefault(key, dict.fromkeys(cls.COUNTERS, 0))
+            for name, value in counters.items():
+                row[name] += sign * value
+        return totals
+
+    @classmethod
+    def record(cls, old_values=None, new_values=None):
+        """
+        Move a listing from the row of ``old_values`` to that of
+        ``new_values``; either may be None for inserts and deletes.
+        """
+        totals = cls.collect([old_values], sign=-1)
+        cls.collect([new_values], totals)
+        cls.apply(totals)
+
+    @classmethod
+    def record_many(cls, listings):
+        cls.apply(cls.collect(listings))
+
+    @classmethod
+    def apply(cls, totals):
+        totals = {key: row for key, row in totals.items() if any(row.values())}
+        if not totals:
+            return
+        cls.objects.bulk_create([cls.from_key(key) for key in totals], ignore_conflicts=True)
+        for key, row in totals.items():
+            cls.objects.filter(**cls.key_lookup(key)).update(
+                **{name: F(name) + value for name, value in row.items() if value}
+            )
+
+    @classmethod
+    def from_key(cls, key, **counters):
+        return cls(**cls.key_lookup(key), **counters)
+
+    @staticmethod
+    def key_lookup(key):
+        city, property_type, month, action = key
+        return {'city': city, 'property_type': property_type, 'month': month, 'action': action}
+
+    @classmethod
+    def compute(cls):
+        # The table as it should be, from the property rows
+        listings = Property.objects.values(*cls.SOURCE_FIELDS).order_by().iterator(chunk_size=2000)
+        return cls.collect(listings)
+
+    @classmethod
+    def rebuild(cls):
+        totals = cls.compute()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                [cls.from_key(key, **row) for key, row in totals.items() if row['count']],
+                batch_size=500,
+            )
+        return len(totals)
+
+    @classmethod
+    def find_inconsistencies(cls):
+        """
+        Compare the table with a recount. Returns ``(key, stored, expected)``
+        for every row that differs, with None for a missing row.
+        """
+        expected = cls.compute()
+        stored = {}
+        for statistic in cls.objects.all():
+            key = (statistic.city, statistic.property_type, statistic.month, statistic.action)
+            stored[key] = {name: getattr(statistic, name) for name in cls.COUNTERS}
+
+        def nonzero(row):
+            # Rows emptied by moves are the same as missing ones
+            return row if row and any(row.values()) else None
+
+        return [
+            (key, nonzero(stored.get(key)), nonzero(expected.get(key)))
+            for key in sorted(set(stored) | set(expected), key=str)
+            if nonzero(stored.get(key)) != nonzero(expected.get(key))
+        ]
+
+    def __str__(self):
+        return f"{self.city} {self.property_type} {self.month:%Y-%m} {self.action}: {self.count}"
+
+
+# Reference count per stored image file
+class ImageBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.IntegerField(default=0)
+
+    @classmethod
+    def acquire(cls, names):
+        cls._adjust(names, 1)
+
+    @classmethod
+    def release(cls, names):
+        cls._adjust(names, -1)
+
+    @classmethod
+    def _adjust(cls, names, step):
+        counts = {}
+        for name in names:
+            counts[name] = counts.get(name, 0) + step
+        if not counts:
+            return
+        cls.objects.bulk_create([cls(name=name) for name in counts], ignore_conflicts=True)
+        by_delta = {}
+        for name, delta in counts.items():
+            by_delta.setdefault(delta, []).append(name)
+        for delta, group in by_delta.items():
+            cls.objects.filter(name__in=group).update(ref_count=F('ref_count') + delta)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
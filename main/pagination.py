@@ -0,0 +1,207 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import FloatField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import DEFAULT_ORDERING, parse_ordering
+from .models import Property
+
+
+class PropertyCursorPagination(BasePagination):
+    """
+    Keyset pagination over (<ordering field>, pid), newest first by default.
+
+    The cursor carries the key of the boundary row instead of an offset, so
+    every page is a range seek on the matching index no matter how deep
+    the client has paged. The ordering field comes from the view's filter
+    backend (``?ordering=``) and defaults to ``-created_date``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'PROPERTY_PAGE_SIZE', api_settings.PAGE_SIZE)
+        max_page_size = getattr(settings, 'PROPERTY_MAX_PAGE_SIZE', page_size)
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=max_page_size,
+            )
+        except (KeyError, ValueError):
+            return page_size
+
+    def get_ordering(self, request, view):
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                return backend().get_ordering(request)
+        return parse_ordering(DEFAULT_ORDERING)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        reverse, key = self.start(request, view)
+        results = []
+        for page in self.get_segment_querysets(queryset, reverse, key):
+            remaining = self.page_size + 1 - len(results)
+            if remaining <= 0:
+                break
+            results.extend(page[:remaining])
+        return self.finish(results, reverse, key)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Same as paginate_queryset, on the async ORM
+        reverse, key = self.start(request, view)
+        results = []
+        for page in self.get_segment_querysets(queryset, reverse, key):
+            remaining = self.page_size + 1 - len(results)
+            if remaining <= 0:
+                break
+            results.extend([item async for item in page[:remaining]])
+        return self.finish(results, reverse, key)
+
+    def start(self, request, view):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.field, self.descending = self.get_ordering(request, view)
+        return self.decode_cursor(request)
+
+    def get_segment_querysets(self, queryset, reverse, key):
+        ordering = self.get_order_by(reverse)
+        return [queryset.filter(segment).order_by(*ordering) for segment in self.get_segments(reverse, key)]
+
+    def finish(self, results, reverse, key):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = key is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = key is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_key(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.get_key(self.page[0]))
+
+    def get_key(self, item):
+        # Model instances, or .values() rows
+        if isinstance(item, dict):
+            return item[self.field], item['pid']
+        return getattr(item, self.field), item.pid
+
+    def get_order_by(self, reverse):
+        prefix = '-' if self.descending != reverse else ''
+        return f'{prefix}{self.field}', f'{prefix}pid'
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            ordering = tokens['o'][0]
+            value = tokens['v'][0]
+            pid = tokens['p'][0]
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor only makes sense under the ordering that produced it
+        if ordering != self.ordering_token():
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            value = self.get_model_field().to_python(value) if value else None
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, (value, pid)
+
+    def encode_cursor(self, reverse, key):
+        value, pid = key
+        tokens = {
+            'r': '1' if reverse else '0',
+            'o': self.ordering_token(),
+            'v': '' if value is None else str(value),
+            'p': pid,
+        }
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_model_field(self):
+        try:
+            return Property._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            # Annotations such as the full-text search_rank
+            return FloatField()
+
+    def ordering_token(self):
+        return f"{'-' if self.descending else ''}{self.field}"
+
+    def get_segments(self, reverse, key):
+        """
+        Filters selecting the rows past ``key`` in scan direction, one per
+        segment, nearest segment first.
+
+        Rows where the ordering field is NULL sort after every other row.
+        Splitting them into their own segment keeps each query a single
+        range seek on the index instead of an OR that forces a scan.
+        """
+        field = self.field
+        op = 'lt' if self.descending != reverse else 'gt'
+        present = Q(**{f'{field}__isnull': False})
+        missing = Q(**{f'{field}__isnull': True})
+        if not self.get_model_field().null:
+            missing = None
+
+        if key is None:
+            segments = [present, missing]
+        else:
+            value, pid = key
+            if value is None:
+                after_key = Q(**{f'{field}__isnull': True, f'pid__{op}': pid})
+                segments = [after_key, present] if reverse else [after_key]
+            else:
+                after_key = Q(**{f'{field}__{op}e': value}) & (
+                    Q(**{f'{field}__{op}': value}) | Q(**{f'pid__{op}': pid})
+                )
+                segments = [after_key] if reverse else [after_key, missing]
+        return [segment for segment in segments if segment is not None]
@@ -0,0 +1,165 @@
+import datetime
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+# Converter marker for ``a.b`` lookups: the value passes through and None
+# omits the key, as DRF skips a read-only field whose relation is missing
+SKIP_NONE = object()
+
+
+class RowSerializer:
+    """
+    Read-only stand-in for a ModelSerializer's ``many=True`` output that
+    works on ``.values()`` rows instead of model instances.
+
+    The serializer's readable fields are compiled once into (key, column,
+    converter) entries, so serializing a page is a loop over dicts with no
+    field objects, model instances or attribute lookups in between, and
+    gives the serializer's output value for value. Supported: model
+    columns, ``a.b`` lookups through a foreign key and nested ``many=True``
+    ModelSerializers over reverse foreign keys (one query per page).
+    Anything else raises ImproperlyConfigured.
+    """
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        # (key, column, converter or None); column is None for nested
+        # serializers, whose converter is (foreign key, RowSerializer)
+        self.entries = []
+        for key, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                self.entries.append((key, None, self.compile_nested(key, field)))
+            else:
+                self.entries.append((key, *self.compile_field(key, field)))
+        self.columns = [column for _, column, _ in self.entries if column is not None]
+        if len(self.columns) < len(self.entries) and 'pk' not in self.columns:
+            self.columns.append('pk')
+
+    def compile_field(self, key, field):
+        if field.source == '*':
+            raise ImproperlyConfigured(f"{key}: fields on the whole instance can't be read from rows.")
+        column = '__'.join(field.source_attrs)
+        if len(field.source_attrs) > 1:
+            return column, SKIP_NONE
+        model_field = self.model._meta.get_field(column)
+        if model_field.is_relation:
+            raise ImproperlyConfigured(f"{key}: relation fields can't be read from rows.")
+        return column, converter(field, model_field)
+
+    def compile_nested(self, key, field):
+        relation = self.model._meta.get_field(field.source)
+        if not (relation.one_to_many and isinstance(field.child, serializers.ModelSerializer)):
+            raise ImproperlyConfigured(f"{key}: only reverse foreign keys can be nested.")
+        return relation.field.name, RowSerializer(field.child)
+
+    def queryset(self, queryset, *extra):
+        """
+        ``queryset`` as rows of the columns to serialize and the ``extra``
+        ones, keeping its annotations (the pagination may order by them).
+        Prefetches are dropped: nested rows come from serialize().
+        """
+        columns = dict.fromkeys([*self.columns, *extra, *queryset.query.annotations])
+        return queryset.prefetch_related(None).values(*columns)
+
+    def serialize(self, rows, request=None):
+        entries = []
+        for key, column, convert in self.entries:
+            if column is None:
+                foreign_key, child = convert
+                children = child.fetch(foreign_key, [row['pk'] for row in rows], request)
+                entries.append((key, None, children))
+            else:
+                entries.append((key, column, bind(convert, request)))
+
+        data = []
+        for row in rows:
+            item = {}
+            for key, column, convert in entries:
+                if column is None:
+                    item[key] = convert.get(row['pk'], [])
+                    continue
+                value = row[column]
+                if value is None:
+                    if convert is SKIP_NONE:
+                        continue
+                elif convert is not None and convert is not SKIP_NONE:
+                    value = convert(value)
+                item[key] = value
+            data.append(item)
+        return data
+
+    def fetch(self, foreign_key, pks, request):
+        # Serialized rows related to ``pks``, grouped by parent, in the
+        # order the related manager returns them
+        if not pks:
+            return {}
+        queryset = self.model.objects.filter(**{f'{foreign_key}__in': pks}).order_by(*self.model._meta.ordering or ['pk'])
+        rows = list(queryset.values(*self.columns, foreign_key))
+        grouped = {}
+        for row, item in zip(rows, self.serialize(rows, request)):
+            grouped.setdefault(row[foreign_key], []).append(item)
+        return grouped
+
+
+def converter(field, model_field):
+    """
+    A function turning a column value into what ``field.to_representation``
+    returns for the model attribute, or None where they are the same.
+    """
+    if isinstance(field, serializers.FileField):
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return None
+        return FileURL(model_field.storage)
+    if isinstance(field, serializers.DecimalField):
+        # The database converter already quantized the value
+        if (getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+                and not field.localize and not field.normalize_output):
+            return '{:f}'.format
+        return field.to_representation
+    if isinstance(field, serializers.DateTimeField):
+        return field.to_representation
+    if isinstance(field, serializers.DateField):
+        if (getattr(field, 'format', api_settings.DATE_FORMAT) or '').lower() == ISO_8601:
+            return datetime.date.isoformat
+        return field.to_representation
+    if getattr(field, 'coerce_to_string', False):
+        return field.to_representation
+    if isinstance(field, (serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+                          serializers.FloatField, serializers.BooleanField, serializers.ReadOnlyField)):
+        return None
+    return field.to_representation
+
+
+# Stored names that FileSystemStorage.url() and build_absolute_uri()
+# append to the base URL unchanged: no characters to quote, no dot
+# segments, not absolute
+PLAIN_NAME = re.compile(r'[\w-][\w.-]*(?:/[\w-][\w.-]*)*', re.ASCII)
+
+
+class FileURL:
+    # FileField.to_representation for a stored name; bound per request
+    def __init__(self, storage):
+        self.storage = storage
+
+    def bind(self, request):
+        url = self.storage.url
+        if request is not None:
+            absolute = request.build_absolute_uri
+            url = lambda name, url=url: absolute(url(name))
+
+        if not isinstance(self.storage, FileSystemStorage) or not self.storage.base_url.endswith('/'):
+            return lambda name: url(name) if name else None
+        # The general path parses and joins URLs for every name; plain
+        # names only need the (equally resolved) base URL in front
+        prefix = url('')
+        plain = PLAIN_NAME.fullmatch
+        return lambda name: (prefix + name if plain(name) else url(name)) if name else None
+
+
+def bind(convert, request):
+    return convert.bind(request) if isinstance(convert, FileURL) else convert
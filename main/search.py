@@ -0,0 +1,72 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .cache import invalidate
+
+FTS_TABLE = 'main_property_fts'
+
+# bm25() weight per indexed column, in table order
+SEARCH_WEIGHTS = (
+    ('title', 10.0),
+    ('street_address', 2.0),
+    ('city', 5.0),
+    ('state', 3.0),
+    ('seller_name', 1.0),
+    ('pid', 1.0),
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(term):
+    """
+    Turn free text into a safe FTS5 query: every word must match, as a
+    prefix, so FTS operators in user input are never interpreted.
+    """
+    return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(term))
+
+
+def search_properties(queryset, term):
+    """
+    Restrict ``queryset`` to properties matching ``term`` and annotate a
+    ``search_rank`` (lower is more relevant).
+    """
+    match = build_match_query(term)
+    if not match:
+        return queryset.none()
+
+    if not uses_fts():
+        condition = Q()
+        for token in TOKEN_RE.findall(term):
+            condition &= Q(title__icontains=token) | Q(street_address__icontains=token) | Q(city__icontains=token) \
+                | Q(state__icontains=token) | Q(seller_name__icontains=token) | Q(pid__icontains=token)
+        return queryset.filter(condition).annotate(search_rank=RawSQL('0.0', ()))
+
+    weights = ', '.join(str(weight) for _, weight in SEARCH_WEIGHTS)
+    table = queryset.model._meta.db_table
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+    ).annotate(search_rank=RawSQL(
+        f'SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id',
+        (match,),
+    ))
+
+
+def rebuild_index(optimize=True):
+    # Re-read every row from main_property into the external-content index
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+        if optimize:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('optimize')")
+    # Cached search responses may have come from the stale index
+    invalidate()
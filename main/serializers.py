@@ -1,15 +1,23 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.utils import validate_file_name
 from rest_framework import serializers
 from .models import Property, PropertyImage
+from .storage import property_image_storage
+from .uploads import ImageUploadField
 
 class PropertyImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = PropertyImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'thumbnail', 'medium', 'webp', 'width', 'height']
 
 class PropertySerializer(serializers.ModelSerializer):
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+    representation_query_param = 'representation'
+
     images = PropertyImageSerializer(many=True, read_only=True)
     image_files = serializers.ListField(
-        child=serializers.ImageField(),
+        child=ImageUploadField(),
         write_only=True,
         required=False
     )
@@ -26,10 +34,86 @@ class PropertySerializer(serializers.ModelSerializer):
             'pid', 'property_type', 'title', 'seller_name', 'phone_number',
             'email', 'street_address', 'city', 'state', 'price', 'size',
             'bedrooms', 'bathrooms', 'built_year', 'legal_document',
-            'map', 'status', 'images', 'image_files', 'user', 'action',
-            'created_date', 'transaction_date'
+            'map', 'latitude', 'longitude', 'status', 'images', 'cover_image',
+            'image_count', 'image_files', 'user', 'action', 'created_date',
+            'transaction_date'
         ]
 
+    # Named fieldsets for ?representation=
+    REPRESENTATIONS = {
+        'full': [name for name in Meta.fields if name != 'image_files'],
+        # Catalogue pages: the cover image and count stand in for the images
+        'list': [name for name in Meta.fields if name not in ('images', 'image_files')],
+        'compact': ['pid', 'title', 'price', 'city', 'cover_image', 'image_count'],
+    }
+
+    def __init__(self, *args, fields=None, **kwargs):
+        # fields: a sparse fieldset, as returned by requested_fields()
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request, representation='full'):
+        """
+        The fields picked by ``?fields=pid,title``, ``?representation=compact``
+        and ``?exclude=images``, starting from ``representation`` when
+        neither of the first two is given; None for every field.
+        """
+        params = request.query_params
+        fields = cls.parse_field_list(params, cls.fields_query_param)
+        exclude = cls.parse_field_list(params, cls.exclude_query_param)
+        if cls.representation_query_param in params:
+            if fields is not None:
+                raise serializers.ValidationError({
+                    cls.representation_query_param: [f"Can't be combined with ?{cls.fields_query_param}=."],
+                })
+            representation = params[cls.representation_query_param]
+            if representation not in cls.REPRESENTATIONS:
+                raise serializers.ValidationError({
+                    cls.representation_query_param: [f"Must be one of: {', '.join(cls.REPRESENTATIONS)}."],
+                })
+        if fields is None:
+            fields = cls.REPRESENTATIONS[representation]
+        if exclude is not None:
+            fields = [name for name in fields if name not in exclude]
+            if not fields:
+                raise serializers.ValidationError({cls.exclude_query_param: ["No fields left."]})
+        return None if fields == cls.REPRESENTATIONS['full'] else fields
+
+    @classmethod
+    def parse_field_list(cls, params, param):
+        value = params.get(param)
+        if value is None:
+            return None
+        fields = [name for name in dict.fromkeys(value.split(',')) if name]
+        unknown = [name for name in fields if name not in cls.REPRESENTATIONS['full']]
+        if unknown or not fields:
+            raise serializers.ValidationError({
+                param: [f"Unknown fields: {', '.join(unknown)}." if unknown else "No fields given."],
+            })
+        return fields
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, keep=()):
+        # Load everything to_representation touches up front so a list
+        # costs a fixed number of queries instead of one per row. With a
+        # sparse fieldset only its columns and relations are loaded, plus
+        # the ``keep`` columns.
+        if fields is None:
+            return queryset.select_related('user').prefetch_related('images')
+        columns = ['pid', *keep]
+        for name in fields:
+            if name == 'user':
+                queryset = queryset.select_related('user')
+                columns += ['user', 'user__username']
+            elif name == 'images':
+                queryset = queryset.prefetch_related('images')
+            else:
+                columns.append(name)
+        return queryset.only(*dict.fromkeys(columns))
+
     def create(self, validated_data):
         image_files = validated_data.pop('image_files', [])
         # Set the user from the request context
@@ -38,6 +122,9 @@ class PropertySerializer(serializers.ModelSerializer):
         
         for image_file in image_files:
             PropertyImage.objects.create(property=property_instance, image=image_file)
+        if image_files:
+            # Saving the images updated the stored summary
+            property_instance.refresh_from_db(fields=['cover_image', 'image_count'])
         
         return property_instance
 
@@ -51,5 +138,49 @@ class PropertySerializer(serializers.ModelSerializer):
         if image_files:
             for image_file in image_files:
                 PropertyImage.objects.create(property=instance, image=image_file)
+            instance.refresh_from_db(fields=['cover_image', 'image_count'])
         
-        return instance
\ No newline at end of file
+        return instance
+
+class StoredImageNameField(serializers.CharField):
+    """
+    Name of a photo already in the property image storage. Imports point
+    listings at uploaded files by name; it has to fit PropertyImage.image
+    and stay inside the storage.
+    """
+    default_error_messages = {
+        'unsafe': 'Must be a relative path inside the image storage.',
+        'missing': 'No stored image with this name.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_length', PropertyImage._meta.get_field('image').max_length)
+        super().__init__(**kwargs)
+
+    def run_validation(self, data=serializers.empty):
+        # After the length check, so long names never reach the storage
+        name = super().run_validation(data)
+        try:
+            validate_file_name(name, allow_relative_path=True)
+        except SuspiciousFileOperation:
+            self.fail('unsafe')
+        if not property_image_storage().exists(name):
+            self.fail('missing')
+        return name
+
+
+class PropertyImportSerializer(serializers.ModelSerializer):
+    # Storage names of images that are already uploaded
+    images = serializers.ListField(
+        child=StoredImageNameField(),
+        required=False
+    )
+
+    class Meta:
+        model = Property
+        fields = [
+            'property_type', 'title', 'seller_name', 'phone_number',
+            'email', 'street_address', 'city', 'state', 'price', 'size',
+            'bedrooms', 'bathrooms', 'built_year', 'legal_document',
+            'map', 'latitude', 'longitude', 'action', 'images'
+        ]
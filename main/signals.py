@@ -0,0 +1,49 @@
+# main/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate
+from .images import schedule
+from .models import ImageBlob, Property, PropertyImage, PropertyStatistic
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_property_cache(sender, instance=None, **kwargs):
+    invalidate(instance.pid)
+
+
+@receiver(post_delete, sender=Property)
+def remove_from_statistics(sender, instance=None, **kwargs):
+    # The row is gone; deletes load instances, so their values are the stored ones
+    PropertyStatistic.record(instance.get_statistic_values(), None)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def invalidate_property_image_cache(sender, instance=None, **kwargs):
+    try:
+        pid = instance.property.pid
+    except Property.DoesNotExist:
+        # The listing itself is being deleted and invalidates on its own
+        pid = None
+    invalidate(pid)
+
+
+@receiver(post_save, sender=PropertyImage)
+def queue_image_processing(sender, instance=None, created=False, **kwargs):
+    if created:
+        schedule([instance.pk])
+
+
+@receiver(post_delete, sender=PropertyImage)
+def update_image_summary(sender, instance=None, origin=None, **kwargs):
+    # Not when the delete cascades from the listing itself
+    if not isinstance(origin, Property):
+        Property.update_image_summary([instance.property_id])
+
+
+@receiver(post_delete, sender=PropertyImage)
+def release_image_blobs(sender, instance=None, **kwargs):
+    # Files stay on disk until collect_image_blobs finds them unreferenced
+    ImageBlob.release(name for name in instance.get_file_names().values() if name)
@@ -0,0 +1,81 @@
+from django.db.models import Q, Sum
+from rest_framework import serializers
+
+from .models import Property, PropertyStatistic
+
+GROUPINGS = ('city', 'property_type', 'month')
+
+
+class MonthField(serializers.DateField):
+    # ``YYYY-MM``, as the first day of that month
+    def __init__(self, **kwargs):
+        super().__init__(input_formats=['%Y-%m'], **kwargs)
+
+
+class StatisticsQuerySerializer(serializers.Serializer):
+    city = serializers.CharField(max_length=100, required=False)
+    property_type = serializers.ChoiceField(choices=Property.PROPERTY_TYPES, required=False)
+    since = MonthField(required=False)
+    until = MonthField(required=False)
+    group_by = serializers.CharField(required=False, default='city')
+
+    def validate_group_by(self, value):
+        groups = [group for group in value.split(',') if group]
+        if not groups or any(group not in GROUPINGS for group in groups):
+            raise serializers.ValidationError(f"Group by a comma separated subset of: {', '.join(GROUPINGS)}.")
+        return groups
+
+
+def ratio(numerator, denominator, places=2):
+    if not denominator:
+        return None
+    return round(numerator / denominator, places)
+
+
+def summarize(params):
+    """
+    Market figures from the PropertyStatistic summary rows, grouped by
+    ``group_by``. Reads a few rows per group instead of every listing.
+    """
+    serializer = StatisticsQuerySerializer(data={key: value for key, value in params.items() if value != ''})
+    serializer.is_valid(raise_exception=True)
+    query = serializer.validated_data
+
+    rows = PropertyStatistic.objects.all()
+    if 'city' in query:
+        rows = rows.filter(city=query['city'])
+    if 'property_type' in query:
+        rows = rows.filter(property_type=query['property_type'])
+    if 'since' in query:
+        rows = rows.filter(month__gte=query['since'])
+    if 'until' in query:
+        rows = rows.filter(month__lte=query['until'])
+
+    sold = Q(action='Sold')
+    groups = query['group_by']
+    totals = rows.values(*groups).order_by(*groups).annotate(
+        listings=Sum('count'),
+        sold_count=Sum('count', filter=sold),
+        price_total=Sum('price_sum'),
+        size_total=Sum('size_sum'),
+        sold_price_total=Sum('price_sum', filter=sold),
+        timed_sales=Sum('timed_sale_count', filter=sold),
+        days_total=Sum('days_to_sale_sum', filter=sold),
+    ).filter(listings__gt=0)
+
+    results = []
+    for total in totals:
+        sold_count = total['sold_count'] or 0
+        result = {group: total[group] for group in groups}
+        if 'month' in result:
+            result['month'] = result['month'].strftime('%Y-%m')
+        result.update({
+            'ongoing_count': total['listings'] - sold_count,
+            'sold_count': sold_count,
+            'average_price': ratio(total['price_total'], total['listings']),
+            'average_sold_price': ratio(total['sold_price_total'] or 0, sold_count),
+            'price_per_size': ratio(total['price_total'], total['size_total']),
+            'average_days_to_sale': ratio(total['days_total'] or 0, total['timed_sales'] or 0, 1),
+        })
+        results.append(result)
+    return results
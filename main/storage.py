@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage, storages
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file under the SHA-256 digest of its bytes.
+
+    The directory and extension of the requested name are kept, the rest is
+    replaced: ``property/images/A000001_1.jpg`` becomes
+    ``property/images/3f/a2/3fa2...e9.jpg``. Saving bytes that are already
+    stored writes nothing and returns the existing name, so re-uploads of
+    the same photo share one blob. Blobs are reference-counted by
+    main.models.ImageBlob and removed by ``manage.py collect_image_blobs``.
+    """
+    chunk_size = 64 * 1024
+
+    def digest(self, content):
+        sha = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(self.chunk_size):
+            sha.update(chunk)
+        content.seek(0)
+        return sha.hexdigest()
+
+    def content_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return '/'.join(part for part in (directory, digest[:2], digest[2:4], f'{digest}{extension}') if part)
+
+    def _save(self, name, content):
+        name = self.content_name(name, self.digest(content))
+        if self.exists(name):
+            # Refresh the mtime so garbage collection treats it as in use
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+def property_image_storage():
+    return storages['property_images']
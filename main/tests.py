@@ -1,3 +1,1445 @@
-from django.test import TestCase
+import contextlib
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.cache import cache as django_cache
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import SimpleLazyObject
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from PIL import Image
+
+from accounts.models import CustomUser
+from core.database import serialized_write, sqlite_database
+from core.media import serve_media
+from core.renderers import FastJSONRenderer
+from core.routers import PrimaryReplicaRouter, ReplicaRoutingMiddleware, routing_stats, snapshot_replica
+from core.throttling import ScopedTokenBucketThrottle, get_store
+from .cache import get_cache
+from .geo import within_bbox
+from .images import process_image
+from .models import ImageBlob, Property, PropertyImage, PropertySequence, PropertyStatistic
+
+
+def make_property(user=None, **overrides):
+    data = {
+        'property_type': 'Land',
+        'title': 'Plot',
+        'seller_name': 'Seller',
+        'phone_number': '0911000000',
+        'email': 'seller@example.com',
+        'street_address': 'Main street',
+        'city': 'Addis Ababa',
+        'state': 'Addis Ababa',
+        'price': '1000.00',
+        'size': '250.00',
+        'user': user,
+    }
+    data.update(overrides)
+    return Property.objects.create(**data)
+
+
+class PropertyTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='broker', email='broker@example.com', password='secret-pass'
+        )
+        self.client.force_authenticate(self.user)
+        get_cache().clear()
+        get_store().clear()
+
+    def add_properties(self, count, **overrides):
+        for i in range(count):
+            prop = make_property(self.user, **overrides)
+            PropertyImage.objects.create(property=prop, image=f'property/images/{prop.pid}_{i}.jpg')
+
+
+class PropertyQueryCountTests(PropertyTestCase):
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assert_constant_queries(self, url, **overrides):
+        self.add_properties(2, **overrides)
+        small = self.count_queries(url)
+        self.add_properties(10, **overrides)
+        self.assertEqual(self.count_queries(url), small)
+
+    def test_list_query_count_is_constant(self):
+        self.assert_constant_queries('/api/main/properties/')
+
+    def test_ongoing_query_count_is_constant(self):
+        self.assert_constant_queries('/api/main/properties/ongoing/')
+
+    def test_sold_query_count_is_constant(self):
+        self.assert_constant_queries('/api/main/properties/sold/', action='Sold')
+
+
+class PropertyPaginationTests(PropertyTestCase):
+    def walk(self, url):
+        pids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pids.extend(row['pid'] for row in response.data['results'])
+            url = response.data['next']
+        return pids
+
+    def test_pages_cover_catalogue_in_key_order(self):
+        self.add_properties(7)
+        Property.objects.filter(pid__in=['L000001', 'L000002']).update(created_date=None)
+        Property.objects.filter(pid='L000007').update(created_date='2020-01-01')
+
+        pids = self.walk('/api/main/properties/?page_size=2')
+        self.assertEqual(pids, ['L000006', 'L000005', 'L000004', 'L000003',
+                                'L000007', 'L000002', 'L000001'])
+
+    def test_previous_link_returns_preceding_page(self):
+        self.add_properties(5)
+        first = self.client.get('/api/main/properties/?page_size=2').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+
+    def test_previous_links_walk_back_across_undated_rows(self):
+        self.add_properties(5)
+        Property.objects.filter(pid__in=['L000001', 'L000002']).update(created_date=None)
+        url = '/api/main/properties/?page_size=2'
+        while url:
+            data = self.client.get(url).data
+            url = data['next']
+
+        pids = [row['pid'] for row in data['results']]
+        while data['previous']:
+            data = self.client.get(data['previous']).data
+            pids = [row['pid'] for row in data['results']] + pids
+        self.assertEqual(pids, ['L000005', 'L000004', 'L000003', 'L000002', 'L000001'])
+
+    def test_page_size_is_capped(self):
+        self.add_properties(3)
+        with self.settings(PROPERTY_MAX_PAGE_SIZE=2):
+            response = self.client.get('/api/main/properties/?page_size=50')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_actions_are_paginated(self):
+        self.add_properties(3, action='Sold')
+        response = self.client.get('/api/main/properties/sold/?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/main/properties/?cursor=bogus')
+        self.assertEqual(response.status_code, 404)
+
+
+class PropertySequenceTests(PropertyTestCase):
+    def test_pids_are_sequential_per_type(self):
+        self.assertEqual(make_property().pid, 'L000001')
+        self.assertEqual(make_property(property_type='Apartment').pid, 'A000001')
+        self.assertEqual(make_property().pid, 'L000002')
+
+    def test_reserve_block(self):
+        make_property()
+        self.assertEqual(PropertySequence.reserve('Land', 3), range(2, 5))
+        self.assertEqual(make_property().pid, 'L000005')
+
+    def test_failed_insert_releases_pid(self):
+        house = Property(property_type='House', title='Villa', seller_name='S', phone_number='1',
+                         email='s@example.com', street_address='R', city='Adama', state='Oromia',
+                         price='10', size='5', bathrooms=1, built_year=2000)
+        with self.assertRaises(ValueError):
+            house.save()
+        self.assertEqual(house.pid, '')
+        house.bedrooms = 2
+        house.save()
+        self.assertEqual(house.pid, 'H000001')
+        self.assertEqual(make_property(property_type='House', bedrooms=1, bathrooms=1, built_year=2000).pid, 'H000002')
+
+    def test_missing_counter_is_seeded_from_existing_pids(self):
+        make_property()
+        make_property()
+        PropertySequence.objects.all().delete()
+        self.assertEqual(make_property().pid, 'L000003')
+
+
+class PropertySequenceConcurrencyTests(TransactionTestCase):
+    def create(self, _):
+        try:
+            return make_property().pid
+        finally:
+            connections.close_all()
+
+    def test_parallel_creates_get_unique_pids(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            pids = list(pool.map(self.create, range(40)))
+        self.assertEqual(sorted(pids), [f'L{n:06d}' for n in range(1, 41)])
+
+
+@override_settings(SQLITE_WRITE_BACKOFF=0)
+class SQLiteConnectionTests(TransactionTestCase):
+    def test_wal_profile_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 600)
+
+    def test_asgi_disables_persistent_connections(self):
+        profile = settings.SQLITE_PROFILES['wal']
+        self.assertEqual(sqlite_database('db.sqlite3', profile, 5)['CONN_MAX_AGE'], 600)
+        self.assertEqual(sqlite_database('db.sqlite3', profile, 5, persistent=False)['CONN_MAX_AGE'], 0)
+
+        script = (
+            "import os, core.asgi; from django.conf import settings; "
+            "print(settings.DATABASES['default']['CONN_MAX_AGE'], os.environ['DJANGO_SERVER_INTERFACE'])"
+        )
+        env = {key: value for key, value in os.environ.items() if key != 'DJANGO_SERVER_INTERFACE'}
+        result = subprocess.run([sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.split(), ['0', 'asgi'])
+
+    def test_serialized_writes_retry_lock_errors(self):
+        calls = []
+
+        @serialized_write
+        def write():
+            calls.append(connection.in_atomic_block)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return make_property().pid
+
+        self.assertEqual(write(), 'L000001')
+        self.assertEqual(calls, [True, True, True])
+
+        calls.clear()
+        with self.settings(SQLITE_WRITE_RETRIES=1), self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 2)
+
+        @serialized_write
+        def broken():
+            calls.append(None)
+            raise OperationalError('no such table: nope')
+
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(calls, [None])
+
+    def test_parallel_serialized_writes(self):
+        def create(_):
+            try:
+                return serialized_write(make_property)().pid
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            pids = list(pool.map(create, range(40)))
+        self.assertEqual(len(set(pids)), 40)
+
+
+class PropertySaveTests(PropertyTestCase):
+    def test_update_does_not_reload_row(self):
+        prop = make_property()
+        prop = Property.objects.get(pk=prop.pk)
+        prop.title = 'Renamed'
+        with CaptureQueriesContext(connection) as ctx:
+            prop.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertTrue(sql.startswith('UPDATE'))
+        self.assertIn('"title"', sql)
+        self.assertNotIn('"price"', sql)
+
+    def test_unchanged_save_writes_nothing(self):
+        prop = Property.objects.get(pk=make_property().pk)
+        with CaptureQueriesContext(connection) as ctx:
+            prop.save()
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_update_fields_are_narrowed_to_changes(self):
+        prop = Property.objects.get(pk=make_property().pk)
+        prop.title = 'Renamed'
+        prop.city = 'Adama'
+        prop.save(update_fields=['title', 'price'])
+        stored = Property.objects.get(pk=prop.pk)
+        self.assertEqual(stored.title, 'Renamed')
+        self.assertEqual(stored.city, 'Addis Ababa')
+        self.assertEqual(prop.get_dirty_fields(), ['city'])
+
+    def test_transaction_date_follows_action(self):
+        prop = make_property()
+        prop.action = 'Sold'
+        prop.save(update_fields=['action'])
+        prop = Property.objects.get(pk=prop.pk)
+        self.assertIsNotNone(prop.transaction_date)
+
+        prop.action = 'Ongoing'
+        prop.save()
+        self.assertIsNone(Property.objects.get(pk=prop.pk).transaction_date)
+
+    def test_deferred_fields_set_after_load_are_saved(self):
+        prop = Property.objects.only('pid', 'action', 'map').get(pk=make_property().pk)
+        prop.price = '5.00'
+        prop.save()
+        self.assertEqual(str(Property.objects.get(pk=prop.pk).price), '5.00')
+
+    def test_patch_selects_property_once(self):
+        prop = make_property(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f'/api/main/properties/{prop.pid}/', {'title': 'New'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        selects = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('SELECT') and 'FROM "main_property"' in q['sql']]
+        self.assertEqual(len(selects), 1)
+
+
+IMPORT_CSV = (
+    "property_type,title,seller_name,phone_number,email,street_address,city,state,price,size,bedrooms,bathrooms,built_year,images\n"
+    "Land,Plot A,Abebe,0911,a@example.com,Road 1,Adama,Oromia,100,50,,,,a.jpg|b.jpg\n"
+    "House,Villa,Abebe,0911,a@example.com,Road 2,Adama,Oromia,900,120,3,2,2015,\n"
+    "House,No rooms,Abebe,0911,a@example.com,Road 3,Adama,Oromia,900,120,,,,\n"
+    "Land,Bad price,Abebe,0911,a@example.com,Road 4,Adama,Oromia,-5,50,,,,\n"
+)
+
+
+class PropertyImportTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # Rows reference photos that are already stored
+        for name in ['a.jpg', 'b.jpg', *[f'flat{i}.jpg' for i in range(5)]]:
+            with open(os.path.join(media_root, name), 'wb') as handle:
+                handle.write(make_jpeg())
+
+    def test_bulk_endpoint_imports_valid_rows_and_reports_errors(self):
+        make_property()
+        upload = SimpleUploadedFile('listings.csv', IMPORT_CSV.encode(), content_type='text/csv')
+        response = self.client.post('/api/main/properties/bulk/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['rows'], 4)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertIn('price', response.data['errors'][1]['errors'])
+        self.assertIsNotNone(response.data['rows_per_second'])
+
+        land = Property.objects.get(title='Plot A')
+        self.assertEqual(land.pid, 'L000002')
+        self.assertEqual(land.user, self.user)
+        self.assertEqual(land.status, 'Pending')
+        self.assertEqual(sorted(land.images.values_list('image', flat=True)), ['a.jpg', 'b.jpg'])
+        self.assertEqual((land.cover_image.name, land.image_count), ('a.jpg', 2))
+        self.assertEqual(Property.objects.get(title='Villa').pid, 'H000001')
+        self.assertEqual(make_property().pid, 'L000003')
+
+    def test_bulk_endpoint_rejects_unreadable_input(self):
+        lines = IMPORT_CSV.encode().splitlines(keepends=True)
+        for bad_row in [b'Land,Caf\xe9,Abebe,0911,a@example.com,Road 5,Adama,Oromia,100,50,,,,\n',
+                        # Over csv.field_size_limit()
+                        b'Land,"' + b'x' * 200000 + b'",Abebe,0911,a@example.com,Road 5,Adama,Oromia,100,50,,,,\n']:
+            with self.subTest(bad_row=bad_row):
+                upload = SimpleUploadedFile('listings.csv', b''.join([*lines[:2], bad_row, *lines[2:]]))
+                response = self.client.post('/api/main/properties/bulk/', {'file': upload}, format='multipart')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.data['complete'])
+                self.assertEqual(response.data['errors'][-1]['row'], 2)
+                self.assertIn('Unreadable input', response.data['errors'][-1]['errors']['non_field_errors'][0])
+                self.assertEqual(response.data['created'], 1)
+
+    def test_image_names_must_be_stored_files(self):
+        header, row = IMPORT_CSV.splitlines()[:2]
+        cases = {
+            '../secret.jpg': 'relative path', '/etc/passwd': 'relative path', 'missing.jpg': 'No stored image',
+            'x' * 101 + '.jpg': 'no more than 100 characters',
+        }
+        lines = [header, *(row.replace('a.jpg|b.jpg', f'a.jpg|{name}') for name in cases)]
+        upload = SimpleUploadedFile('listings.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        response = self.client.post('/api/main/properties/bulk/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.data['created'], 0)
+        for error, message in zip(response.data['errors'], cases.values()):
+            self.assertIn(message, str(error['errors']['images'][1][0]))
+        self.assertFalse(PropertyImage.objects.exists())
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_bulk_endpoint_requires_file(self):
+        response = self.client.post('/api/main/properties/bulk/', {}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_command_reads_jsonl_in_batches(self):
+        rows = [
+            {'property_type': 'Apartment', 'title': f'Flat {i}', 'seller_name': 'S',
+             'phone_number': '1', 'email': 's@example.com', 'street_address': 'R',
+             'city': 'Bahir Dar', 'state': 'Amhara', 'price': '10', 'size': '5',
+             'action': 'Sold', 'images': [f'flat{i}.jpg']}
+            for i in range(5)
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('\n'.join(json.dumps(row) for row in rows) + '\n{not json\n')
+        self.addCleanup(os.remove, handle.name)
+
+        out, err = StringIO(), StringIO()
+        call_command('import_properties', handle.name, '--batch-size', '2',
+                     '--user', self.user.email, stdout=out, stderr=err)
+
+        self.assertIn('Imported 5 of 6 rows', out.getvalue())
+        self.assertIn('row 6', err.getvalue())
+        self.assertEqual(
+            list(Property.objects.order_by('pid').values_list('pid', flat=True)),
+            [f'A{n:06d}' for n in range(1, 6)],
+        )
+        self.assertFalse(Property.objects.filter(transaction_date__isnull=True).exists())
+        self.assertEqual(PropertyImage.objects.count(), 5)
+        self.assertEqual(PropertyStatistic.objects.get(city='Bahir Dar', action='Sold').count, 5)
+        self.assertEqual(PropertyStatistic.find_inconsistencies(), [])
+
+
+class PropertyExportTests(PropertyTestCase):
+    def read_stream(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_values_without_model_instances(self):
+        self.add_properties(3)
+        with mock.patch.object(Property, 'from_db', side_effect=AssertionError):
+            response = self.client.get('/api/main/properties/export/')
+            content = self.read_stream(response)
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = content.splitlines()
+        self.assertTrue(lines[0].startswith('pid,property_type,title'))
+        self.assertEqual(len(lines), 4)
+        self.assertIn('L000001,Land,Plot', lines[1])
+        self.assertIn(',broker,Ongoing,', lines[1])
+
+    def test_jsonl_export(self):
+        self.add_properties(2, action='Sold')
+        response = self.client.get('/api/main/properties/export/?file_format=jsonl')
+        rows = [json.loads(line) for line in self.read_stream(response).splitlines()]
+        self.assertEqual([row['pid'] for row in rows], ['L000001', 'L000002'])
+        self.assertEqual(rows[0]['price'], '1000.00')
+        self.assertEqual(rows[0]['user'], 'broker')
+        self.assertIsNotNone(rows[0]['transaction_date'])
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/main/properties/export/?file_format=xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        self.add_properties(2)
+        self.add_properties(1, action='Sold')
+        out = StringIO()
+        call_command('export_properties', '--format', 'jsonl', '--action', 'Sold', '--chunk-size', '1', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['pid'] for row in rows], ['L000003'])
+
+
+class PropertyFilterTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        make_property(self.user, city='Adama', price='100.00')
+        make_property(self.user, city='Adama', price='300.00', action='Sold')
+        make_property(self.user, city='Hawassa', price='200.00')
+        make_property(self.user, property_type='House', city='Adama', price='500.00',
+                      bedrooms=3, bathrooms=2, built_year=2010)
+
+    def pids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['pid'] for row in response.data['results']]
+
+    def test_exact_and_range_filters(self):
+        self.assertEqual(self.pids('/api/main/properties/?city=Adama&max_price=300&ordering=price'),
+                         ['L000001', 'L000002'])
+        self.assertEqual(self.pids('/api/main/properties/?min_bedrooms=2'), ['H000001'])
+        self.assertEqual(self.pids('/api/main/properties/ongoing/?city=Adama&ordering=-price'),
+                         ['H000001', 'L000001'])
+
+    def test_ordering_paginates_by_key(self):
+        url = '/api/main/properties/?ordering=-price&page_size=1'
+        pids = []
+        while url:
+            data = self.client.get(url).data
+            pids.extend(row['pid'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(pids, ['H000001', 'L000002', 'L000003', 'L000001'])
+
+    def test_cursor_from_other_ordering_is_rejected(self):
+        cursor_url = self.client.get('/api/main/properties/?ordering=price&page_size=1').data['next']
+        response = self.client.get(cursor_url.replace('ordering=price', 'ordering=size'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_values(self):
+        self.assertEqual(self.client.get('/api/main/properties/?min_price=cheap').status_code, 400)
+        self.assertEqual(self.client.get('/api/main/properties/?ordering=email').status_code, 400)
+
+    def test_export_uses_list_filters(self):
+        response = self.client.get('/api/main/properties/export/?file_format=jsonl&city=Hawassa')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['pid'] for row in rows], ['L000003'])
+
+    def test_filter_plans_use_composite_indexes(self):
+        plan = Property.objects.filter(action='Ongoing', city='Adama', price__lte=300).order_by('price', 'pid').explain()
+        self.assertIn('property_action_city_idx', plan)
+        plan = Property.objects.filter(action='Sold').order_by('-created_date', '-pid').explain()
+        self.assertIn('property_action_created_idx', plan)
+
+
+class PropertySearchTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        make_property(self.user, title='Sunny villa with garden', city='Adama')
+        make_property(self.user, title='Garden plot', city='Hawassa', street_address='Lake road')
+        make_property(self.user, title='Office block', city='Adama', state='Oromia')
+
+    def pids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['pid'] for row in response.data['results']]
+
+    def test_search_ranks_title_matches_first(self):
+        Property.objects.filter(pid='L000003').update(street_address='Garden street')
+        self.assertEqual(self.pids('/api/main/properties/?search=garden'), ['L000002', 'L000001', 'L000003'])
+
+    def test_search_uses_prefixes_and_combines_with_filters(self):
+        self.assertEqual(self.pids('/api/main/properties/?search=gard&city=Adama'), ['L000001'])
+        self.assertEqual(self.pids('/api/main/properties/?search=lake'), ['L000002'])
+
+    def test_search_follows_saves_and_deletes(self):
+        prop = Property.objects.get(pid='L000003')
+        prop.title = 'Garden office'
+        prop.save()
+        self.assertIn('L000003', self.pids('/api/main/properties/?search=garden'))
+        prop.delete()
+        self.assertNotIn('L000003', self.pids('/api/main/properties/?search=garden'))
+
+    def test_search_pages_by_rank(self):
+        url = '/api/main/properties/?search=garden&page_size=1'
+        pids = []
+        while url:
+            data = self.client.get(url).data
+            pids.extend(row['pid'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(sorted(pids), ['L000001', 'L000002'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.pids('/api/main/properties/?search="garden" OR NOT)*'), [])
+
+    def test_relevance_needs_search(self):
+        self.assertEqual(self.client.get('/api/main/properties/?ordering=relevance').status_code, 400)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO main_property_fts(main_property_fts) VALUES('delete-all')")
+        self.assertEqual(self.pids('/api/main/properties/?search=office'), [])
+        call_command('rebuild_property_search', stdout=StringIO())
+        self.assertEqual(self.pids('/api/main/properties/?search=office'), ['L000003'])
+
+    def test_index_triggers_survive_migrations(self):
+        # SQLite drops them whenever a migration rebuilds main_property; such
+        # a migration has to re-create them (see 0015 and 0016)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'main_property'")
+            triggers = {name for name, in cursor.fetchall()}
+        self.assertEqual(triggers, {
+            f'main_property_{index}_{event}' for index in ('fts', 'rtree') for event in ('insert', 'update', 'delete')
+        })
+
+    def test_admin_search_uses_index(self):
+        admin_user = CustomUser.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_login(admin_user)
+        response = self.client.get('/admin/main/property/?q=villa')
+        self.assertContains(response, 'L000001')
+        self.assertContains(response, '1 result')
+
+
+class PropertyGeoTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        # Addis Ababa centre, Bole (~6 km away) and Adama (~75 km away)
+        make_property(self.user, map='https://www.google.com/maps/@9.0300,38.7400,15z')
+        make_property(self.user, latitude=8.9806, longitude=38.7900)
+        make_property(self.user, map='https://maps.google.com/?q=8.5400,39.2700')
+        make_property(self.user)
+
+    def pids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['pid'] for row in response.data['results']]
+
+    def test_coordinates_follow_map_link_unless_supplied(self):
+        prop = Property.objects.get(pid='L000001')
+        self.assertEqual((prop.latitude, prop.longitude), (9.03, 38.74))
+
+        prop.map = 'https://www.google.com/maps/place/x/data=!3d9.1!4d38.8'
+        prop.save()
+        self.assertEqual(Property.objects.values_list('latitude', 'longitude').get(pid='L000001'), (9.1, 38.8))
+
+        prop.map = 'https://maps.app.goo.gl/QFRcixxU3TVtWocV6'
+        prop.latitude, prop.longitude = 9.2, 38.9
+        prop.save()
+        self.assertEqual(Property.objects.values_list('latitude', 'longitude').get(pid='L000001'), (9.2, 38.9))
+
+    def test_bounding_box(self):
+        self.assertEqual(self.pids('/api/main/properties/?bbox=38.7,8.9,38.8,9.1&ordering=pid'),
+                         ['L000001', 'L000002'])
+
+    def test_radius_orders_by_distance(self):
+        self.assertEqual(self.pids('/api/main/properties/?near=8.98,38.79&radius=10'), ['L000002', 'L000001'])
+        self.assertEqual(self.pids('/api/main/properties/?near=9.03,38.74&radius=100&page_size=1'), ['L000001'])
+        self.assertEqual(self.pids('/api/main/properties/?near=9.03,38.74&radius=2'), ['L000001'])
+
+    def test_spatial_index_follows_updates_and_deletes(self):
+        Property.objects.filter(pid='L000003').update(latitude=9.031, longitude=38.741)
+        self.assertEqual(self.pids('/api/main/properties/?near=9.03,38.74&radius=1'), ['L000001', 'L000003'])
+        Property.objects.filter(pid='L000001').delete()
+        self.assertEqual(self.pids('/api/main/properties/?near=9.03,38.74&radius=1'), ['L000003'])
+
+    def test_invalid_geo_params(self):
+        for query in ('bbox=1,2,3', 'near=95,10', 'radius=3', 'bbox=40,9,38,10', 'ordering=distance'):
+            self.assertEqual(self.client.get(f'/api/main/properties/?{query}').status_code, 400, query)
+
+    def test_bbox_plan_uses_rtree(self):
+        plan = within_bbox(Property.objects.all(), (38.7, 8.9, 38.8, 9.1)).explain()
+        self.assertIn('main_property_rtree', plan)
+
+
+class PropertyCacheTests(PropertyTestCase):
+    def test_repeated_list_is_served_from_cache(self):
+        self.add_properties(2)
+        first = self.client.get('/api/main/properties/?page_size=1')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/main/properties/?page_size=1')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertFalse([q for q in ctx.captured_queries if 'main_property' in q['sql']])
+
+        other_page = self.client.get(first.data['next'])
+        self.assertEqual(other_page['X-Cache'], 'MISS')
+
+    def test_conditional_requests(self):
+        self.add_properties(1)
+        response = self.client.get('/api/main/properties/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/main/properties/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # No Last-Modified: the cache can't tell when the rows changed
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get('/api/main/properties/',
+                                         HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200)
+        self.assertEqual(self.client.get('/api/main/properties/', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_writes_invalidate_lists_and_that_property_only(self):
+        self.add_properties(2)
+        self.client.get('/api/main/properties/')
+        self.client.get('/api/main/properties/L000001/')
+        self.client.get('/api/main/properties/L000002/')
+
+        prop = Property.objects.get(pid='L000001')
+        prop.title = 'Changed'
+        prop.save()
+
+        response = self.client.get('/api/main/properties/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Changed', [row['title'] for row in response.data['results']])
+        self.assertEqual(self.client.get('/api/main/properties/L000001/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/main/properties/L000002/')['X-Cache'], 'HIT')
+
+    def test_image_changes_invalidate(self):
+        self.add_properties(1)
+        self.client.get('/api/main/properties/L000001/')
+        PropertyImage.objects.filter(property__pid='L000001').first().delete()
+        response = self.client.get('/api/main/properties/L000001/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['images'], [])
+
+    def test_errors_are_not_cached(self):
+        self.client.get('/api/main/properties/L999999/')
+        self.assertEqual(self.client.get('/api/main/properties/L999999/').status_code, 404)
+        make_property(pid='L999999')
+        self.assertEqual(self.client.get('/api/main/properties/L999999/').status_code, 200)
+
+
+def make_jpeg(size=(1600, 900), orientation=None):
+    picture = Image.new('RGB', size, (200, 120, 40))
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    picture.save(buffer, format='JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+class PropertyImagePipelineTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root, PROPERTY_IMAGE_PROCESSING='sync')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_upload_generates_variants_and_strips_exif(self):
+        upload = SimpleUploadedFile('photo.jpg', make_jpeg(orientation=6), content_type='image/jpeg')
+        data = {
+            'property_type': 'Land', 'title': 'Plot', 'seller_name': 'S', 'phone_number': '1',
+            'email': 's@example.com', 'street_address': 'R', 'city': 'Adama', 'state': 'Oromia',
+            'price': '10', 'size': '5', 'image_files': [upload],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/main/properties/', data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        image = PropertyImage.objects.get()
+        self.assertTrue(image.processed)
+        # Orientation 6 rotates the 1600x900 sensor image to portrait
+        self.assertEqual((image.width, image.height), (900, 1600))
+        with image.image.open('rb') as original:
+            self.assertFalse(Image.open(original).getexif())
+
+        expected = {'thumbnail': (180, 320), 'medium': (720, 1280), 'webp': (720, 1280)}
+        for field, size in expected.items():
+            with getattr(image, field).open('rb') as variant:
+                picture = Image.open(variant)
+                self.assertEqual(picture.size, size)
+                self.assertFalse(picture.getexif())
+        self.assertEqual(Image.open(image.webp.path).format, 'WEBP')
+
+        row = self.client.get(f"/api/main/properties/{response.data['pid']}/").data['images'][0]
+        self.assertTrue(row['thumbnail'].endswith(f'{image.thumbnail.name}'))
+        self.assertEqual((row['width'], row['height']), (900, 1600))
+
+    def test_unreadable_images_stay_pending(self):
+        prop = make_property()
+        with self.assertLogs('main.images', 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                image = PropertyImage.objects.create(property=prop, image='property/images/missing.jpg')
+            image.refresh_from_db()
+            self.assertFalse(image.processed)
+            self.assertFalse(process_image(image.pk))
+
+    def test_thread_mode_hands_work_to_the_pool(self):
+        prop = make_property()
+        with override_settings(PROPERTY_IMAGE_PROCESSING='thread'), \
+                mock.patch('main.images.get_executor') as get_executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            image = PropertyImage.objects.create(property=prop, image='property/images/x.jpg')
+        get_executor.return_value.submit.assert_called_once_with(mock.ANY, image.pk)
+
+    def test_command_processes_pending_images(self):
+        prop = make_property()
+        name = PropertyImage._meta.get_field('image').storage.save('property/images/p.jpg', SimpleUploadedFile('p.jpg', make_jpeg()))
+        PropertyImage.objects.bulk_create([PropertyImage(property=prop, image=name)])
+        out = StringIO()
+        call_command('process_property_images', stdout=out)
+        self.assertIn('Processed 1 images', out.getvalue())
+        self.assertTrue(PropertyImage.objects.get().thumbnail)
+
+
+class PropertyImageBlobTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root, PROPERTY_IMAGE_PROCESSING='sync')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.storage = PropertyImage._meta.get_field('image').storage
+
+    def upload(self, prop, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = PropertyImage.objects.create(property=prop, image=SimpleUploadedFile('photo.png', content))
+        image.refresh_from_db()
+        return image
+
+    def make_png(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), color).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_image_blobs', *args, stdout=out)
+        return out.getvalue()
+
+    def test_identical_uploads_share_one_blob(self):
+        content = self.make_png('red')
+        first = self.upload(make_property(), content)
+        second = self.upload(make_property(), content)
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^property/images/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).ref_count, 2)
+        # Variants of identical pictures are identical too
+        self.assertEqual(ImageBlob.objects.get(name=first.thumbnail.name).ref_count, 2)
+
+    def test_collect_deletes_only_unreferenced_blobs(self):
+        content = self.make_png('blue')
+        first = self.upload(make_property(), content)
+        second = self.upload(make_property(), content)
+        name = first.image.name
+
+        first.delete()
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 1)
+        self.collect('--grace-hours', '0')
+        self.assertTrue(self.storage.exists(name))
+
+        second.property.delete()
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 0)
+        # Recently written blobs are kept for the grace period
+        self.assertIn('0 unreferenced blobs', self.collect())
+        self.assertIn('Would delete 4 unreferenced blobs', self.collect('--grace-hours', '0', '--dry-run'))
+        self.assertTrue(self.storage.exists(name))
+        self.assertIn('Deleted 4 unreferenced blobs', self.collect('--grace-hours', '0'))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_collect_removes_untracked_files(self):
+        kept = self.upload(make_property(), self.make_png('green'))
+        stray = self.storage.save('property/images/stray.png', SimpleUploadedFile('stray.png', b'stray'))
+        self.assertIn('1 untracked files', self.collect('--grace-hours', '0'))
+        self.assertFalse(self.storage.exists(stray))
+        self.assertTrue(self.storage.exists(kept.image.name))
+
+
+@override_settings(PROPERTY_UPLOAD_MAX_FILE_BYTES=64 * 1024, PROPERTY_UPLOAD_MAX_FILES=3)
+class PropertyUploadLimitTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root, PROPERTY_IMAGE_PROCESSING='sync')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def post(self, files):
+        data = {
+            'property_type': 'Land', 'title': 'Plot', 'seller_name': 'S', 'phone_number': '1',
+            'email': 's@example.com', 'street_address': 'R', 'city': 'Adama', 'state': 'Oromia',
+            'price': '10', 'size': '5', 'image_files': files,
+        }
+        return self.client.post('/api/main/properties/', data, format='multipart')
+
+    def photo(self, name='photo.jpg', format='JPEG', size=(200, 100)):
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, format=format)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_uploads_are_streamed_to_disk_and_stored(self):
+        with mock.patch('main.serializers.PropertyImage.objects.create', wraps=PropertyImage.objects.create) as create:
+            response = self.post([self.photo(), self.photo('b.png', 'PNG')])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(all(hasattr(call.kwargs['image'], 'temporary_file_path') for call in create.call_args_list))
+        self.assertEqual(PropertyImage.objects.count(), 2)
+
+    def test_oversized_requests_fail_with_413(self):
+        too_big = SimpleUploadedFile('big.jpg', b'x' * (64 * 1024 + 1))
+        self.assertEqual(self.post([too_big]).status_code, 413)
+        self.assertEqual(self.post([self.photo() for _ in range(4)]).status_code, 413)
+        with override_settings(PROPERTY_UPLOAD_MAX_BYTES=1024):
+            response = self.post([self.photo()])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.data['detail'].code, 'upload_too_large')
+        self.assertFalse(Property.objects.exists())
+
+    def test_images_are_validated_from_headers(self):
+        photo = self.photo()
+        with mock.patch('PIL.Image.Image.load') as load:
+            self.assertEqual(self.post([photo]).status_code, 201)
+        load.assert_not_called()
+
+        not_image = SimpleUploadedFile('notes.jpg', b'plain text')
+        self.assertIn('image_files', self.post([not_image]).data)
+        self.assertIn('Unsupported image format GIF', str(self.post([self.photo('a.gif', 'GIF')]).data))
+        with override_settings(PROPERTY_IMAGE_MAX_PIXELS=100):
+            self.assertIn('at most 100 are allowed', str(self.post([self.photo()]).data))
+
+
+class MediaServingTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        storage = PropertyImage._meta.get_field('image').storage
+        self.name = storage.save('property/images/a.png', SimpleUploadedFile('a.png', b'0123456789'))
+        self.url = f'/media/{self.name}'
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, headers=headers)
+        response.body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response
+
+    def test_content_addressed_files_are_immutable(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['ETag'], f'"{os.path.basename(self.name)[:64]}"')
+
+        self.assertEqual(self.get(**{'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_other_files_revalidate(self):
+        storage = PropertyImage._meta.get_field('image').storage
+        path = os.path.join(storage.location, 'legacy.jpg')
+        with open(path, 'wb') as handle:
+            handle.write(b'legacy')
+        response = self.get('/media/legacy.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.get('/media/legacy.jpg', **{'If-Modified-Since': response['Last-Modified']}).status_code, 304)
+
+    def test_ranges(self):
+        response = self.get(Range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        # Only whole files may be handed to sendfile()
+        for headers, sendfile in [({'Range': 'bytes=2-5'}, False), ({}, True)]:
+            response = serve_media(RequestFactory().get(self.url, headers=headers), self.name)
+            self.assertEqual(hasattr(response.file_to_stream, 'fileno'), sendfile)
+            response.close()
+
+        self.assertEqual(self.get(Range='bytes=-3').body, b'789')
+        self.assertEqual(self.get(Range='bytes=7-').body, b'789')
+        self.assertEqual(self.get(Range='bytes=10-').status_code, 416)
+        # A stale If-Range gets the whole file
+        self.assertEqual(self.get(Range='bytes=2-5', **{'If-Range': '"old"'}).status_code, 200)
+
+    def test_missing_and_escaping_paths(self):
+        self.assertEqual(self.get('/media/nope.png').status_code, 404)
+        self.assertEqual(self.get('/media/property').status_code, 404)
+        self.assertEqual(self.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_offload_modes(self):
+        with override_settings(MEDIA_SERVE_MODE='x-accel-redirect'):
+            response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.body, b'')
+        with override_settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.get()
+        self.assertTrue(response['X-Sendfile'].endswith(self.name))
+        self.assertIn('ETag', response)
+
+
+class PropertyAsyncViewTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_properties(5)
+        self.auth = {'Authorization': f'Token {Token.objects.get_or_create(user=self.user)[0].key}'}
+
+    async def test_list_matches_sync_view(self):
+        sync = await sync_to_async(self.client.get)('/api/main/properties/?page_size=2&ordering=pid')
+        response = await self.async_client.get('/api/main/async/properties/?page_size=2&ordering=pid', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'], json.loads(sync.content)['results'])
+
+        next_url = response.json()['next']
+        self.assertIn('/api/main/async/properties/', next_url)
+        page = await self.async_client.get(next_url, headers=self.auth)
+        self.assertEqual(len(page.json()['results']), 2)
+
+        cached = await self.async_client.get('/api/main/async/properties/?page_size=2&ordering=pid', headers=self.auth)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+
+    async def test_detail(self):
+        prop = await Property.objects.afirst()
+        sync = await sync_to_async(self.client.get)(f'/api/main/properties/{prop.pid}/')
+        response = await self.async_client.get(f'/api/main/async/properties/{prop.pid}/', headers=self.auth)
+        self.assertEqual(response.content, sync.content)
+        self.assertEqual(response['ETag'], sync['ETag'])
+
+        response = await self.async_client.get('/api/main/async/properties/L999999/', headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_errors(self):
+        response = await self.async_client.get('/api/main/async/properties/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = await self.async_client.get('/api/main/async/properties/', headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.get('/api/main/async/properties/?min_price=cheap', headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_price', response.json())
+        response = await self.async_client.post('/api/main/async/properties/', headers=self.auth)
+        self.assertEqual(response.status_code, 405)
+
+    async def test_throttle_runs_off_the_event_loop(self):
+        threads = []
+        allow_request = ScopedTokenBucketThrottle.allow_request
+
+        def record(throttle, request, view):
+            threads.append(threading.get_ident())
+            return allow_request(throttle, request, view)
+
+        with mock.patch.object(ScopedTokenBucketThrottle, 'allow_request', record):
+            response = await self.async_client.get('/api/main/async/properties/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+
+class PropertyStatisticsTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.month = datetime.date.today().replace(day=1)
+
+    def row(self, **lookup):
+        return PropertyStatistic.objects.get(month=self.month, **lookup)
+
+    def test_saves_move_listings_between_rows(self):
+        prop = make_property(price='100.00', size='10.00')
+        make_property(price='300.00', size='10.00')
+        self.assertEqual(self.row(action='Ongoing').count, 2)
+
+        prop = Property.objects.get(pk=prop.pk)
+        prop.action = 'Sold'
+        prop.save()
+        self.assertEqual(self.row(action='Ongoing').count, 1)
+        sold = self.row(action='Sold')
+        self.assertEqual((sold.count, sold.price_sum, sold.timed_sale_count), (1, 100, 1))
+
+        prop.city = 'Adama'
+        prop.save()
+        self.assertEqual(self.row(action='Sold', city='Adama').count, 1)
+        self.assertEqual(self.row(action='Sold', city='Addis Ababa').count, 0)
+
+        prop.delete()
+        self.assertEqual(self.row(action='Sold', city='Adama').count, 0)
+        self.assertEqual(PropertyStatistic.find_inconsistencies(), [])
+
+    def test_unrelated_saves_do_not_touch_statistics(self):
+        prop = Property.objects.get(pk=make_property().pk)
+        prop.title = 'Renamed'
+        with CaptureQueriesContext(connection) as ctx:
+            prop.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_endpoint(self):
+        make_property(price='100.00', size='10.00')
+        make_property(price='300.00', size='20.00')
+        make_property(price='500.00', size='50.00', city='Adama', action='Sold')
+        Property.objects.filter(city='Adama').update(created_date=datetime.date.today() - datetime.timedelta(days=10))
+        PropertyStatistic.rebuild()
+
+        results = self.client.get('/api/main/properties/statistics/').json()['results']
+        by_city = {result['city']: result for result in results}
+        self.assertEqual(by_city['Addis Ababa']['ongoing_count'], 2)
+        self.assertEqual(by_city['Addis Ababa']['average_price'], 200)
+        self.assertEqual(by_city['Addis Ababa']['price_per_size'], 13.33)
+        self.assertEqual(by_city['Adama']['sold_count'], 1)
+        self.assertEqual(by_city['Adama']['average_days_to_sale'], 10)
+
+        results = self.client.get(
+            f'/api/main/properties/statistics/?group_by=month,property_type&since={self.month:%Y-%m}'
+        ).json()['results']
+        self.assertEqual(results, [{
+            'month': f'{self.month:%Y-%m}', 'property_type': 'Land', 'ongoing_count': 2, 'sold_count': 1,
+            'average_price': 300, 'average_sold_price': 500, 'price_per_size': 11.25, 'average_days_to_sale': 10,
+        }])
+        self.assertEqual(self.client.get('/api/main/properties/statistics/?group_by=seller').status_code, 400)
+
+    def test_command_checks_and_rebuilds(self):
+        make_property()
+        self.assertEqual(self.client.get('/api/main/properties/statistics/').data['results'][0]['average_price'], 1000)
+        Property.objects.update(price='5000.00')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_property_statistics', '--check', stdout=out)
+        self.assertIn('Addis Ababa / Land', out.getvalue())
+
+        call_command('rebuild_property_statistics', stdout=out)
+        call_command('rebuild_property_statistics', '--check', stdout=out)
+        self.assertEqual(self.row(action='Ongoing').price_sum, 5000)
+        self.assertEqual(self.client.get('/api/main/properties/statistics/').data['results'][0]['average_price'], 5000)
+
+
+THROTTLE_RATES = {'anon': '100/day', 'property_list': '3/min', 'property_upload': '1/hour'}
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': THROTTLE_RATES})
+class PropertyThrottleTests(PropertyTestCase):
+    def test_list_scope_bursts_then_answers_429(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/main/properties/').status_code, 200)
+        response = self.client.get('/api/main/properties/statistics/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+        # Other users have their own buckets, uploads their own scope
+        self.assertEqual(self.client.post('/api/main/properties/', {}).status_code, 400)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='x')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/main/properties/').status_code, 200)
+
+    def test_tokens_refill_over_time(self):
+        with mock.patch('core.throttling.time.time', return_value=1000.0):
+            for _ in range(3):
+                self.client.get('/api/main/properties/')
+            self.assertEqual(self.client.get('/api/main/properties/').status_code, 429)
+        with mock.patch('core.throttling.time.time', return_value=1020.0):
+            self.assertEqual(self.client.get('/api/main/properties/').status_code, 200)
+            self.assertEqual(self.client.get('/api/main/properties/').status_code, 429)
+
+    async def test_async_views_share_the_list_bucket(self):
+        auth = {'Authorization': f'Token {(await Token.objects.aget_or_create(user=self.user))[0].key}'}
+        for _ in range(3):
+            await sync_to_async(self.client.get)('/api/main/properties/')
+        response = await self.async_client.get('/api/main/async/properties/', headers=auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+    @override_settings(THROTTLE_STORE='core.throttling.LocalTokenBucketStore')
+    def test_local_store(self):
+        get_store().clear()
+        for _ in range(3):
+            self.client.get('/api/main/properties/')
+        self.assertEqual(self.client.get('/api/main/properties/').status_code, 429)
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    # The worker threads need committed rows; the test database is the
+    # command's scratch database
+    @mock.patch('main.management.commands.loadtest_property_api.scratch_database', contextlib.nullcontext)
+    def test_requests_are_not_throttled(self):
+        # More requests than the 'property_list' rate allows, each of them
+        # taking a token from the 'throttle' cache
+        out = StringIO()
+        call_command('loadtest_property_api', '--rows', '20', '--requests', '130', '--concurrency', '4', stdout=out)
+        self.assertEqual(out.getvalue().count(', 0 failed'), 2, out.getvalue())
+
+
+# The test database stands in for the replica: a second SQLite connection
+# to the file couldn't see the test's uncommitted rows
+@override_settings(DATABASE_REPLICAS=['default'], REPLICA_MAX_LAG=None)
+class ReplicaRoutingTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        django_cache.clear()
+        self.add_properties(2)
+        routing_stats.clear()
+
+    def decisions(self):
+        decisions = dict(routing_stats.snapshot()['decisions'])
+        routing_stats.clear()
+        return decisions
+
+    def test_reads_use_replicas_until_the_users_own_write(self):
+        self.assertEqual(self.client.get('/api/main/properties/').status_code, 200)
+        self.assertEqual(set(self.decisions()), {'replica'})
+
+        prop = Property.objects.first()
+        self.decisions()
+        self.assertEqual(self.client.patch(f'/api/main/properties/{prop.pid}/', {'title': 'Renamed'}).status_code, 200)
+        self.assertNotIn('replica', self.decisions())
+        self.client.get('/api/main/properties/')
+        self.assertEqual(set(self.decisions()), {'sticky'})
+
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='x')
+        self.client.force_authenticate(other)
+        # (a query the response cache hasn't seen)
+        self.client.get('/api/main/properties/?ordering=price')
+        self.assertEqual(set(self.decisions()), {'replica'})
+
+    def test_primary_only_reads(self):
+        router = PrimaryReplicaRouter()
+        # No request: management commands, shell
+        self.assertEqual(router.db_for_read(Property), 'default')
+        self.assertEqual(router.db_for_write(Property), 'default')
+
+        def route(request):
+            with transaction.atomic():
+                in_transaction = router.route_read(Property)[1]
+            return HttpResponse(f'{router.route_read(Token)[1]} {in_transaction} {router.route_read(Property)[1]}')
+
+        def authenticated(request, user=self.user):
+            # As DRF does once authentication has run
+            request.user = user
+            return route(request)
+
+        self.assertEqual(ReplicaRoutingMiddleware(authenticated)(RequestFactory().get('/')).content, b'primary primary replica')
+        self.assertEqual(ReplicaRoutingMiddleware(authenticated)(RequestFactory().post('/')).content, b'primary primary primary')
+
+        # Before that (session authentication loading its user), reads
+        # stay on the primary
+        request = RequestFactory().get('/')
+        request.user = SimpleLazyObject(lambda: self.user)
+        self.assertEqual(ReplicaRoutingMiddleware(route)(request).content, b'primary primary primary')
+
+    @override_settings(REPLICA_MAX_LAG=60)
+    def test_unsnapshotted_replicas_are_skipped(self):
+        self.client.get('/api/main/properties/')
+        self.assertEqual(set(self.decisions()), {'stale'})
+
+    def test_stats_endpoint(self):
+        admin = CustomUser.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/accounts/database/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('decisions', response.data)
+        self.assertEqual(response.data['replicas']['default'], {'lag': None, 'stale': False})
+
+
+class ReplicaSnapshotTests(TransactionTestCase):
+    def test_snapshot_copies_primary_and_records_time(self):
+        make_property()
+        make_property()
+        path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with mock.patch.dict(connections['replica'].settings_dict, NAME=path):
+            started = snapshot_replica('replica')
+            # Done twice: the second copy goes over the first one in place
+            started = snapshot_replica('replica')
+
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute('SELECT COUNT(*) FROM main_property').fetchone()[0], 2)
+        self.assertEqual(replica.execute('PRAGMA user_version').fetchone()[0], started)
+        self.assertLess(abs(time.time() - started), 5)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG=None)
+class ReplicaCacheTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+    client_class = APIClient
+
+    def setUp(self):
+        get_cache().clear()
+        get_store().clear()
+        django_cache.clear()
+        self.writer = CustomUser.objects.create_user(username='writer', email='writer@example.com', password='x')
+        self.reader = CustomUser.objects.create_user(username='reader', email='reader@example.com', password='x')
+        self.prop = make_property(self.writer, title='Before')
+
+        # A replica that stops at the data as it is now
+        path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        replica = connections['replica']
+        replica.close()
+        patcher = mock.patch.object(replica, 'settings_dict', {**replica.settings_dict, 'NAME': path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(replica.close)
+        snapshot_replica('replica')
+
+    def titles(self, user):
+        self.client.force_authenticate(user)
+        return [item['title'] for item in self.client.get('/api/main/properties/').json()['results']]
+
+    def test_replica_reads_are_not_cached_for_everyone(self):
+        self.client.force_authenticate(self.writer)
+        response = self.client.patch(f'/api/main/properties/{self.prop.pid}/', {'title': 'After'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.titles(self.reader), ['Before'])
+        self.assertEqual(self.titles(self.writer), ['After'])
+
+
+class PropertyRowSerializationTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_properties(3)
+        make_property(
+            None, title='Villa \u2028 \u00e9t\u00e9 \U0001f3e0', property_type='House', bedrooms=3, bathrooms=2,
+            built_year=2001, action='Sold', latitude=9.03, longitude=0.00001, price='1234567.50',
+        )
+        prop = make_property(self.user, map='https://maps.example.com/?q=9.1,38.7')
+        PropertyImage.objects.create(
+            property=prop, image='property/images/a.jpg', thumbnail='property/thumbs/a.jpg', width=400, height=300,
+        )
+        PropertyImage.objects.create(property=prop, image='property/images/my phot\u00f6 (1).jpg')
+
+    def assert_same_responses(self, url):
+        fast = self.client.get(url)
+        get_cache().clear()
+        with self.settings(PROPERTY_ROW_SERIALIZATION=False):
+            slow = self.client.get(url)
+        get_cache().clear()
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+        self.assertEqual(fast['ETag'], slow['ETag'])
+        return fast
+
+    def test_byte_identical_pages(self):
+        for url in [
+            '/api/main/properties/',
+            '/api/main/properties/?ordering=price&page_size=2',
+            '/api/main/properties/?search=villa',
+            '/api/main/properties/?near=9.03,38.74&radius=500',
+            '/api/main/properties/ongoing/',
+            '/api/main/properties/sold/',
+        ]:
+            with self.subTest(url=url):
+                response = self.assert_same_responses(url)
+        self.assertNotIn('user', response.json()['results'][0])
+
+        response = self.assert_same_responses('/api/main/properties/?ordering=price&page_size=2')
+        self.assert_same_responses(response.json()['next'])
+
+    def test_fast_json_renderer_matches_stdlib(self):
+        data = {
+            'floats': [0.1, 9.03, -38.74, 0.00001, 5e-05, 1.5e-07, 1e16, 123456.0, 0.30000000000000004],
+            'big': 2 ** 70,
+            'text': 'line\u2028separator \u2029 "quoted" \\ \x1f \u00e9 \U0001f3e0',
+            'decimal': Decimal('12.50'),
+            'date': datetime.date(2024, 5, 1),
+            'datetime': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'empty': [{}, [], None, True, False],
+        }
+        for value in [data, data['floats'], {'only': 1.25}]:
+            self.assertEqual(FastJSONRenderer().render(value), JSONRenderer().render(value))
+        self.assertEqual(FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+                         JSONRenderer().render({'a': 1}, 'application/json; indent=2'))
+
+
+class PropertySparseFieldsTests(PropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_properties(2)
+        self.prop = make_property(self.user, title='Villa')
+        PropertyImage.objects.create(property=self.prop, image='property/images/a.jpg', thumbnail='property/thumbs/a.jpg')
+        PropertyImage.objects.create(property=self.prop, image='property/images/b.jpg')
+        self.bare = make_property(self.user, title='Plot')
+        PropertyImage.objects.create(property=self.bare, image='property/images/c.jpg')
+
+    def get(self, url):
+        # Row and serializer paths give the same bytes
+        with CaptureQueriesContext(connection) as ctx:
+            fast = self.client.get(url)
+        queries = [query['sql'] for query in ctx.captured_queries]
+        get_cache().clear()
+        with self.settings(PROPERTY_ROW_SERIALIZATION=False):
+            slow = self.client.get(url)
+        get_cache().clear()
+        self.assertEqual(fast.content, slow.content)
+        return fast, queries
+
+    def test_compact_representation(self):
+        response, queries = self.get('/api/main/properties/?representation=compact&ordering=pid')
+        self.assertEqual(response.status_code, 200)
+        results = {item['pid']: item for item in response.json()['results']}
+        self.assertEqual(list(results[self.prop.pid]), ['pid', 'title', 'city', 'price', 'cover_image', 'image_count'])
+        self.assertEqual(results[self.prop.pid]['image_count'], 2)
+        self.assertEqual(results[self.prop.pid]['cover_image'], 'http://testserver/media/property/thumbs/a.jpg')
+        self.assertEqual(results[self.bare.pid]['cover_image'], 'http://testserver/media/property/images/c.jpg')
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"seller_name"', queries[0])
+
+    def test_fields_and_exclude(self):
+        response, queries = self.get('/api/main/properties/?fields=title,pid,user&ordering=pid')
+        self.assertEqual(list(response.json()['results'][0]), ['pid', 'title', 'user'])
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.get('/api/main/properties/?exclude=images,map')
+        item = response.json()['results'][0]
+        self.assertNotIn('images', item)
+        self.assertNotIn('map', item)
+        self.assertIn('seller_name', item)
+        self.assertFalse([sql for sql in queries if 'main_propertyimage' in sql])
+
+        response, _ = self.get('/api/main/properties/?representation=compact&exclude=cover_image&page_size=1')
+        self.assertEqual(list(response.json()['results'][0]), ['pid', 'title', 'city', 'price', 'image_count'])
+        self.assertEqual(self.get(response.json()['next'])[0].status_code, 200)
+
+        response = self.client.get(f'/api/main/properties/{self.prop.pid}/?fields=pid,images')
+        self.assertEqual(list(response.data), ['pid', 'images'])
+        self.assertEqual(len(response.data['images']), 2)
+
+    def test_invalid_fieldsets(self):
+        for query, param in [
+            ('fields=title,secret', 'fields'), ('fields=image_files', 'fields'), ('exclude=nope', 'exclude'),
+            ('representation=tiny', 'representation'), ('representation=compact&fields=pid', 'representation'),
+            ('fields=pid&exclude=pid', 'exclude'),
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/main/properties/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.data)
+
+
+class PropertyImageSummaryTests(PropertyTestCase):
+    def summary(self, prop):
+        prop.refresh_from_db(fields=['cover_image', 'image_count'])
+        return prop.cover_image.name, prop.image_count
+
+    def test_image_saves_and_deletes_keep_summary(self):
+        prop = make_property(self.user)
+        self.assertEqual(self.summary(prop), ('', 0))
+        first = PropertyImage.objects.create(property=prop, image='property/images/a.jpg')
+        second = PropertyImage.objects.create(property=prop, image='property/images/b.jpg')
+        self.assertEqual(self.summary(prop), ('property/images/a.jpg', 2))
+
+        first.thumbnail = 'property/thumbs/a.jpg'
+        first.save(update_fields=['thumbnail'])
+        self.assertEqual(self.summary(prop), ('property/thumbs/a.jpg', 2))
+
+        first.delete()
+        self.assertEqual(self.summary(prop), ('property/images/b.jpg', 1))
+        PropertyImage.objects.filter(pk=second.pk).delete()
+        self.assertEqual(self.summary(prop), ('', 0))
+        prop.delete()
+
+    def test_list_reads_only_the_property_table(self):
+        self.add_properties(3)
+        for row_serialization in (True, False):
+            get_cache().clear()
+            with self.settings(PROPERTY_ROW_SERIALIZATION=row_serialization), \
+                    CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/api/main/properties/?ordering=pid')
+            item = response.json()['results'][0]
+            self.assertNotIn('images', item)
+            self.assertEqual(item['image_count'], 1)
+            self.assertEqual(item['cover_image'], 'http://testserver/media/property/images/L000001_0.jpg')
+            self.assertFalse([query for query in ctx.captured_queries if 'main_propertyimage' in query['sql']])
+
+        self.assertEqual(len(self.client.get('/api/main/properties/L000001/').data['images']), 1)
+        self.assertIn('images', self.client.get('/api/main/properties/?representation=full').json()['results'][0])
+
+    def test_backfill_command(self):
+        self.add_properties(2)
+        Property.objects.update(cover_image='', image_count=0)
+        out = StringIO()
+        call_command('backfill_property_images', '--batch-size', '1', stdout=out)
+        self.assertIn('2 listings', out.getvalue())
+        self.assertEqual(
+            list(Property.objects.order_by('pid').values_list('cover_image', 'image_count')),
+            [('property/images/L000001_0.jpg', 1), ('property/images/L000002_1.jpg', 1)],
+        )
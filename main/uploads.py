@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser, MultiPartParserError
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser, get_encoding
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload too large.'
+    default_code = 'upload_too_large'
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams every uploaded file straight to a temporary file and enforces
+    the PROPERTY_UPLOAD_* limits while the body is still being read.
+
+    A declared Content-Length over the request limit is refused before any
+    of the body is consumed; everything else is counted chunk by chunk, so
+    an oversized or chunked upload fails as soon as it crosses a limit.
+    """
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_request_bytes = settings.PROPERTY_UPLOAD_MAX_BYTES
+        self.max_file_bytes = settings.PROPERTY_UPLOAD_MAX_FILE_BYTES
+        self.max_files = settings.PROPERTY_UPLOAD_MAX_FILES
+        self.files = 0
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_request_bytes:
+            raise UploadTooLarge(f"Request body exceeds {self.max_request_bytes} bytes.")
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        self.files += 1
+        if self.files > self.max_files:
+            raise UploadTooLarge(f"At most {self.max_files} files can be uploaded at once.")
+        if content_length and content_length > self.max_file_bytes:
+            raise UploadTooLarge(f"'{file_name}' exceeds {self.max_file_bytes} bytes.")
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if start + len(raw_data) > self.max_file_bytes:
+            self.upload_interrupted()
+            raise UploadTooLarge(f"'{self.file_name}' exceeds {self.max_file_bytes} bytes.")
+        if self.received > self.max_request_bytes:
+            self.upload_interrupted()
+            raise UploadTooLarge(f"Uploaded files exceed {self.max_request_bytes} bytes.")
+        return super().receive_data_chunk(raw_data, start)
+
+
+class BoundedMultiPartParser(MultiPartParser):
+    """
+    Multipart parser for endpoints that take property photos. Uses
+    BoundedUploadHandler instead of the request's default handlers, which
+    would hold files of up to FILE_UPLOAD_MAX_MEMORY_SIZE each in memory.
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = get_encoding(parser_context)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        handlers = [BoundedUploadHandler(request)]
+
+        try:
+            data, files = DjangoMultiPartParser(meta, stream, handlers, encoding).parse()
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
+        return DataAndFiles(data, files)
+
+
+class ImageUploadField(serializers.FileField):
+    """
+    Image upload validated from its header alone.
+
+    Pillow's open() only parses the header, which is enough to tell the
+    format and dimensions. Unlike serializers.ImageField nothing is copied
+    into memory and the pixels are never touched here; they are decoded
+    once, later, by the background pipeline in main.images.
+    """
+    default_error_messages = {
+        'invalid_image': 'Upload a valid image. The file you uploaded was either not an image or a corrupted image.',
+        'format': 'Unsupported image format {format}; use one of: {formats}.',
+        'pixels': 'Image is {pixels} pixels; at most {max_pixels} are allowed.',
+    }
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        formats = settings.PROPERTY_IMAGE_FORMATS
+        max_pixels = settings.PROPERTY_IMAGE_MAX_PIXELS
+        try:
+            with Image.open(file) as picture:
+                format, (width, height) = picture.format, picture.size
+        except (OSError, ValueError, Image.DecompressionBombError):
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+
+        if format not in formats:
+            self.fail('format', format=format, formats=', '.join(formats))
+        if width * height > max_pixels:
+            self.fail('pixels', pixels=width * height, max_pixels=max_pixels)
+        file.content_type = Image.MIME.get(format)
+        return file
@@ -1,10 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import property_detail, property_list
 from .views import PropertyViewSet
 
 router = DefaultRouter()
 router.register(r'properties', PropertyViewSet)
 
 urlpatterns = [
+    # Async list/retrieve for ASGI deployments
+    path('async/properties/', property_list, name='property-async-list'),
+    path('async/properties/<str:pid>/', property_detail, name='property-async-detail'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,31 +1,144 @@
-from rest_framework import viewsets
+import codecs
+import functools
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from .cache import LIST_SCOPE, cached_response, detail_scope
+from .filters import ORDERING_FIELDS, PropertyFilterBackend
+from .exporters import CONTENT_TYPES, WRITERS, export_rows
+from .importers import PropertyImporter, detect_format, READERS
 from .models import Property
+from .pagination import PropertyCursorPagination
+from .representation import RowSerializer
 from .serializers import PropertySerializer
+from .statistics import summarize
+from .uploads import BoundedMultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from core.database import serialized_write
+
+
+@functools.lru_cache(maxsize=64)
+def get_row_serializer(fields=None):
+    # fields: a sparse fieldset as a tuple, or None for all; bounded as
+    # clients choose the combinations
+    return RowSerializer(PropertySerializer(fields=fields))
 
 
 class PropertyViewSet(viewsets.ModelViewSet):
     queryset = Property.objects.all()
     serializer_class = PropertySerializer
-    parser_classes = (MultiPartParser, FormParser, JSONParser)
+    parser_classes = (BoundedMultiPartParser, FormParser, JSONParser)
     permission_classes = [IsAuthenticated]
+    pagination_class = PropertyCursorPagination
+    filter_backends = [PropertyFilterBackend]
     lookup_field = 'pid'
 
+    # Reads and writes are rate limited separately (DEFAULT_THROTTLE_RATES)
+    WRITE_ACTIONS = {'create', 'update', 'partial_update', 'destroy', 'bulk_import'}
+
+    # Reads that take ?fields=, ?exclude= and ?representation=; lists
+    # default to the 'list' representation, without the images
+    READ_ACTIONS = {'list', 'retrieve', 'get_ongoing_properties', 'get_sold_properties'}
+
+    @property
+    def throttle_scope(self):
+        return 'property_upload' if self.action in self.WRITE_ACTIONS else 'property_list'
+
+    @functools.cached_property
+    def sparse_fields(self):
+        if self.action not in self.READ_ACTIONS:
+            return None
+        representation = 'full' if self.action == 'retrieve' else 'list'
+        fields = PropertySerializer.requested_fields(self.request, representation)
+        return None if fields is None else tuple(fields)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Sparse fieldsets keep the columns the pagination keys on
+        return self.get_serializer_class().setup_eager_loading(queryset, self.sparse_fields, keep=ORDERING_FIELDS)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields is not None:
+            kwargs['fields'] = self.sparse_fields
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, LIST_SCOPE, lambda: self.paginated_response(self.filter_queryset(self.get_queryset())),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request, detail_scope(kwargs['pid']),
+            lambda: super(PropertyViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
+    def paginated_response(self, queryset):
+        if settings.PROPERTY_ROW_SERIALIZATION:
+            # Same data as the serializer, built from .values() rows
+            rows = get_row_serializer(self.sparse_fields)
+            page = self.paginate_queryset(rows.queryset(queryset, *ORDERING_FIELDS))
+            return self.get_paginated_response(rows.serialize(page, self.request))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    # Writes queue up per process instead of contending for SQLite's lock
+    @serialized_write
     def perform_create(self, serializer):
         # Automatically set the user to the authenticated user
         serializer.save(user=self.request.user)
+
+    @serialized_write
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @serialized_write
+    def perform_destroy(self, instance):
+        instance.delete()
     
     @action(detail=False, methods=['get'], url_path='ongoing')
     def get_ongoing_properties(self, request):
-        ongoing_properties = Property.objects.filter(action='Ongoing')
-        serializer = self.get_serializer(ongoing_properties, many=True)
-        return Response(serializer.data)
+        ongoing_properties = self.filter_queryset(self.get_queryset()).filter(action='Ongoing')
+        return cached_response(request, LIST_SCOPE, lambda: self.paginated_response(ongoing_properties))
 
     @action(detail=False, methods=['get'], url_path='sold')
     def get_sold_properties(self, request):
-        sold_properties = Property.objects.filter(action='Sold')
-        serializer = self.get_serializer(sold_properties, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        sold_properties = self.filter_queryset(self.get_queryset()).filter(action='Sold')
+        return cached_response(request, LIST_SCOPE, lambda: self.paginated_response(sold_properties))
+
+    @action(detail=False, methods=['get'], url_path='statistics')
+    def statistics(self, request):
+        return cached_response(request, LIST_SCOPE, lambda: Response({'results': summarize(request.query_params)}))
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": ["A CSV or JSONL file is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        format = request.data.get('format') or detect_format(upload.name)
+        if format not in READERS:
+            return Response({"format": [f"Unsupported format '{format}'."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = PropertyImporter(user=request.user)
+        report = importer.import_file(codecs.iterdecode(upload, 'utf-8-sig'), format)
+        created = report['created'] and report['complete']
+        return Response(report, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        # ?format= is taken by DRF's renderer negotiation
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in WRITERS:
+            return Response({"file_format": [f"Unsupported format '{file_format}'."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(Property.objects.all())
+        rows = export_rows(queryset, chunk_size=settings.PROPERTY_EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(WRITERS[file_format](rows), content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="properties.{file_format}"'
+        return response